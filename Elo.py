@@ -1,6 +1,15 @@
+import csv
+import json
+import re
+import shutil
+import time
+from datetime import datetime, timezone
+from multiprocessing import get_context, shared_memory
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
-from typing import Dict, Iterable, List, Tuple, Any, Optional
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
 
 # --------------------------------------------
 # Core math (race-subset only)
@@ -11,43 +20,95 @@ def _expected_win_prob(delta_opp_minus_self: np.ndarray) -> np.ndarray:
     return 1.0 / (1.0 + np.power(10.0, delta_opp_minus_self / 400.0))
 
 
+def _pair_term(delta: np.ndarray) -> np.ndarray:
+    # Loss side of one local pair per unit Klocal: damping(delta) * E(delta)^2.
+    # A win against delta is the mirror image: +_pair_term(-delta).
+    E = _expected_win_prob(delta)
+    return E * E / (1.0 + np.abs(delta) / 100.0)
+
+
+def _band_contrib(r_sorted: np.ndarray, opp_pos: np.ndarray, window: int, Klocal: float, fast_math: bool) -> np.ndarray:
+    """
+    (..., n, 2*window) local contributions for ratings in finishing order
+    (leading axes = independent races); column j < window is a loss to a
+    finisher ahead, column j >= window a win.
+    """
+    if fast_math:
+        return _band_contrib_fast(r_sorted, opp_pos, window, Klocal)
+
+    delta = r_sorted[..., opp_pos] - r_sorted[..., None]
+    adjusted_k = Klocal / (1.0 + (np.abs(delta) / 100.0))
+    E = _expected_win_prob(delta)
+
+    # S=1 if athlete beats opponent (finishes ahead => opponent offset > 0)
+    S = np.zeros(2 * window, dtype=np.float64)
+    S[window:] = 1.0
+
+    surprise = np.abs(S - E)
+    return adjusted_k * surprise * (S - E)
+
+
+def _band_sums(
+    r_sorted: np.ndarray,
+    window: int,
+    Klocal: float,
+    fast_math: bool,
+    lo: Union[int, np.ndarray] = 0,
+    hi: Optional[Union[int, np.ndarray]] = None
+) -> np.ndarray:
+    """
+    Local update per finishing position for ratings in finishing order
+    (..., m): row p is finisher p vs. positions p-window..p+window (minus
+    itself); opponents outside [lo, hi) are masked to zero before the row
+    sum. hi defaults to m; per-row (m, 1) bounds keep segments apart.
+    """
+    m = r_sorted.shape[-1]
+    # Opponent offsets, ascending, skipping 0 (same order as the scalar loop)
+    offsets = np.concatenate((
+        np.arange(-window, 0, dtype=np.int64),
+        np.arange(1, window + 1, dtype=np.int64),
+    ))
+    opp_pos = np.arange(m, dtype=np.int64)[:, None] + offsets[None, :]
+    valid = (opp_pos >= lo) & (opp_pos < (m if hi is None else hi))
+    np.clip(opp_pos, 0, m - 1, out=opp_pos)
+
+    contrib = _band_contrib(r_sorted, opp_pos, window, Klocal, fast_math)
+    contrib[..., ~valid] = 0.0
+    return contrib.sum(axis=-1)
+
+
+def _percentile_update(
+    finish_positions: np.ndarray,
+    expected_pos: np.ndarray,
+    denom: Union[int, np.ndarray],
+    Kglobal: float
+) -> np.ndarray:
+    # Actual vs expected finishing percentile (0 best), denom = field size - 1
+    return Kglobal * (finish_positions / denom - expected_pos / denom)
+
+
 def local_updates_for_race(
     elos_race: np.ndarray,
     order: np.ndarray,
     Klocal: float,
-    window: int = 3
+    window: int = 3,
+    fast_math: bool = False
 ) -> np.ndarray:
     """
     Local pairwise updates using only athletes in this race.
     O(n_race * window)
+
+    Vectorized over the whole (n, 2*window) band of opponent offsets
+    (see _band_sums).
+    fast_math: float32 + lookup-table pair terms (see FAST_PAIR_ERROR).
     """
     n = elos_race.size
     local = np.zeros(n, dtype=np.float64)
+    if n <= 1 or window <= 0:
+        return local
 
-    for pos in range(n):
-        ri = elos_race[order[pos]]
-
-        lo = max(0, pos - window)
-        hi = min(n, pos + window + 1)
-
-        opp_pos = np.arange(lo, hi, dtype=np.int32)
-        opp_pos = opp_pos[opp_pos != pos]
-        if opp_pos.size == 0:
-            continue
-
-        opp_idx = order[opp_pos]
-        rj = elos_race[opp_idx]
-
-        delta = rj - ri
-        adjusted_k = Klocal / (1.0 + (np.abs(delta) / 100.0))
-        E = _expected_win_prob(delta)
-
-        # S=1 if athlete beats opponent (finishes ahead => smaller pos)
-        S = (pos < opp_pos).astype(np.float64)
-
-        surprise = np.abs(S - E)
-        local[order[pos]] = np.sum(adjusted_k * surprise * (S - E))
-
+    # Ratings in finishing order (row p = athlete who finished p-th)
+    local[order] = _band_sums(elos_race[order], window, Klocal, fast_math)
     return local
 
 
@@ -64,16 +125,11 @@ def bulk_updates_for_race(
     if n <= 1:
         return np.zeros(n, dtype=np.float64)
 
-    # actual percentile from finish positions (0 best)
-    p_actual = finish_positions / (n - 1)
-
-    # expected percentile from ELO rank within race (higher ELO => expected better)
+    # expected position from ELO rank within race (higher ELO => expected better)
     expected_order = np.argsort(-elos_race, kind="mergesort")
     expected_pos = np.empty(n, dtype=np.int32)
     expected_pos[expected_order] = np.arange(n, dtype=np.int32)
-    p_expected = expected_pos / (n - 1)
-
-    return Kglobal * (p_actual - p_expected)
+    return _percentile_update(finish_positions, expected_pos, n - 1, Kglobal)
 
 
 def apply_race_update(
@@ -83,14 +139,23 @@ def apply_race_update(
     Kglobal: float,
     alpha: float,
     window: int = 3,
-    max_change: Optional[float] = 20.0
+    max_change: Optional[float] = 20.0,
+    profiler: Optional["EloProfiler"] = None,
+    fast_math: bool = False
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Returns (new_elos_race, total_change)
     alpha weights bulk; (1-alpha) weights local
+    profiler: optional EloProfiler to time the local / bulk / clip stages.
+    fast_math: approximate local updates (within fast_math_error_bound).
     """
+    if profiler is not None:
+        return _apply_race_update_profiled(
+            elos_race, finish_positions, Klocal, Kglobal, alpha, window, max_change, profiler, fast_math
+        )
+
     order = np.argsort(finish_positions, kind="mergesort")  # 0 best
-    local = local_updates_for_race(elos_race, order, Klocal=Klocal, window=window)
+    local = local_updates_for_race(elos_race, order, Klocal=Klocal, window=window, fast_math=fast_math)
     bulk = bulk_updates_for_race(elos_race, finish_positions, Kglobal=Kglobal)
 
     total = alpha * bulk + (1.0 - alpha) * local
@@ -100,27 +165,1074 @@ def apply_race_update(
     return elos_race + total, total
 
 
+def apply_segmented_update(
+    elos: np.ndarray,
+    finish_positions: np.ndarray,
+    seg_offsets: np.ndarray,
+    Klocal: float,
+    Kglobal: float,
+    alpha: float,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    fast_math: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    apply_race_update for many independent sub-races at once.
+    Segment s is entries seg_offsets[s]:seg_offsets[s + 1] (CSR layout) with
+    finish positions 0..n_s-1 within the segment. Same numbers as calling
+    apply_race_update on every segment, in one vectorized pass.
+    Returns (new_elos, total_change), aligned with the input.
+    """
+    m = elos.size
+    total = np.zeros(m, dtype=np.float64)
+    if m == 0:
+        return elos + total, total
+    sizes = np.diff(seg_offsets)
+    seg = np.repeat(np.arange(sizes.size, dtype=np.int64), sizes)
+    seg_lo = seg_offsets[:-1][seg]
+    seg_n = sizes[seg]
+
+    # Local: band of opponents, masked to the athlete's own segment
+    order = np.lexsort((finish_positions, seg))  # by segment, then finish (stable)
+    local = np.zeros(m, dtype=np.float64)
+    if window > 0:
+        lo = seg_lo[:, None]
+        local[order] = _band_sums(elos[order], window, Klocal, fast_math, lo=lo, hi=lo + seg_n[:, None])
+
+    # Bulk: actual vs expected percentile within the segment
+    expected_order = np.lexsort((-elos, seg))
+    expected_pos = np.empty(m, dtype=np.int64)
+    expected_pos[expected_order] = np.arange(m, dtype=np.int64) - seg_lo[expected_order]
+    bulk = _percentile_update(finish_positions, expected_pos, np.maximum(seg_n - 1, 1), Kglobal)
+    bulk[seg_n <= 1] = 0.0
+
+    total = alpha * bulk + (1.0 - alpha) * local
+    if max_change is not None:
+        total = np.clip(total, -max_change, max_change)
+
+    return elos + total, total
+
+
+def apply_batched_update(
+    elos: np.ndarray,
+    finish_positions: np.ndarray,
+    Klocal: float,
+    Kglobal: float,
+    alpha: float,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    fast_math: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    apply_race_update for a batch of independent, equally sized races:
+    row b of the (batch, n) inputs is one race (finish positions 0..n-1).
+    Same numbers as calling apply_race_update per row.
+    Returns (new_elos, total_change), both (batch, n).
+    """
+    elos = np.asarray(elos, dtype=np.float64)
+    batch, n = elos.shape
+    total = np.zeros((batch, n), dtype=np.float64)
+    if n <= 1:
+        return elos + total, total
+
+    order = np.argsort(finish_positions, axis=1, kind="mergesort")  # 0 best
+    local = np.zeros((batch, n), dtype=np.float64)
+    if window > 0:
+        r_sorted = np.take_along_axis(elos, order, axis=1)
+        np.put_along_axis(local, order, _band_sums(r_sorted, window, Klocal, fast_math), axis=1)
+
+    expected_order = np.argsort(-elos, axis=1, kind="mergesort")
+    expected_pos = np.empty((batch, n), dtype=np.int32)
+    np.put_along_axis(expected_pos, expected_order, np.broadcast_to(np.arange(n, dtype=np.int32), (batch, n)), axis=1)
+    bulk = _percentile_update(finish_positions, expected_pos, n - 1, Kglobal)
+
+    total = alpha * bulk + (1.0 - alpha) * local
+    if max_change is not None:
+        total = np.clip(total, -max_change, max_change)
+
+    return elos + total, total
+
+
+def _apply_race_update_profiled(
+    elos_race: np.ndarray,
+    finish_positions: np.ndarray,
+    Klocal: float,
+    Kglobal: float,
+    alpha: float,
+    window: int,
+    max_change: Optional[float],
+    profiler: "EloProfiler",
+    fast_math: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Same math as apply_race_update, with a clock read between stages
+    t0 = time.perf_counter()
+    order = np.argsort(finish_positions, kind="mergesort")  # 0 best
+    local = local_updates_for_race(elos_race, order, Klocal=Klocal, window=window, fast_math=fast_math)
+    t1 = time.perf_counter()
+    bulk = bulk_updates_for_race(elos_race, finish_positions, Kglobal=Kglobal)
+    t2 = time.perf_counter()
+
+    total = alpha * bulk + (1.0 - alpha) * local
+    clip_hits = 0
+    if max_change is not None:
+        clip_hits = int(np.count_nonzero(np.abs(total) > max_change))
+        total = np.clip(total, -max_change, max_change)
+    new_elos = elos_race + total
+    t3 = time.perf_counter()
+
+    profiler.add("local", t1 - t0)
+    profiler.add("bulk", t2 - t1)
+    profiler.add("clip", t3 - t2)
+    profiler.record_race(elos_race.size, clip_hits)
+    return new_elos, total
+
+
+# --------------------------------------------
+# Fast-math mode (float32 + lookup table)
+# --------------------------------------------
+# The local pair term only depends on the rating gap, so fast_math=True reads
+# it from a table quantized every FAST_LUT_STEP points over +/-FAST_LUT_RANGE
+# (nearest node) instead of evaluating the power, damping and surprise per
+# pair, and does the band in float32. Off-table gaps fall back to the damping
+# alone (E is 0 or 1 to within 1e-5 there).
+#
+# Accuracy bound: every pair term is within FAST_PAIR_ERROR of the exact one
+# (one table step of slope, plus float32 rounding of ratings up to ~4000),
+# so a rating change differs from exact mode by at most
+# fast_math_error_bound(Klocal, alpha, window). Bulk updates are exact.
+
+FAST_LUT_RANGE = 2000.0
+FAST_LUT_STEP = 0.125
+
+
+def _build_pair_lut() -> Tuple[np.ndarray, float]:
+    grid = np.arange(-FAST_LUT_RANGE, FAST_LUT_RANGE + FAST_LUT_STEP / 2, FAST_LUT_STEP)
+    exact = _pair_term(grid)
+    # Nearest-node error <= one step of the largest slope (+ float32 slack)
+    bound = float(np.max(np.abs(np.diff(exact)))) + 5e-6
+    return exact, bound
+
+
+_PAIR_TABLE, FAST_PAIR_ERROR = _build_pair_lut()
+# Signed float32 tables, Klocal already folded in: losses then wins
+_SIGNED_LUTS: Dict[float, np.ndarray] = {}
+
+
+def fast_math_error_bound(Klocal: float = 4.5, alpha: float = 0.2, window: int = 3) -> float:
+    """Max |rating change difference| between fast_math and exact mode for one race."""
+    return (1.0 - alpha) * Klocal * 2 * window * FAST_PAIR_ERROR
+
+
+def _signed_lut(Klocal: float) -> np.ndarray:
+    lut = _SIGNED_LUTS.get(Klocal)
+    if lut is None:
+        if len(_SIGNED_LUTS) >= 16:  # parameter sweeps: keep the cache bounded
+            _SIGNED_LUTS.clear()
+        lut = np.concatenate((-Klocal * _PAIR_TABLE, Klocal * _PAIR_TABLE[::-1])).astype(np.float32)
+        _SIGNED_LUTS[Klocal] = lut
+    return lut
+
+
+def _band_contrib_fast(r_sorted: np.ndarray, opp_pos: np.ndarray, window: int, Klocal: float) -> np.ndarray:
+    # float32 band, one table read per pair; see _band_contrib for the layout
+    lut = _signed_lut(float(Klocal))
+    slots = _PAIR_TABLE.size
+    r32 = r_sorted.astype(np.float32)
+    delta = r32[..., opp_pos]
+    delta -= r32[..., None]
+
+    base = np.full(2 * window, FAST_LUT_RANGE / FAST_LUT_STEP + 0.5, dtype=np.float32)
+    base[window:] += slots
+    # Only a field spread wider than the table can produce off-table gaps
+    wide = float(r_sorted.max() - r_sorted.min()) > FAST_LUT_RANGE
+    u = np.clip(delta, -FAST_LUT_RANGE, FAST_LUT_RANGE) if wide else delta.copy()
+    u *= np.float32(1.0 / FAST_LUT_STEP)
+    u += base
+    contrib = lut[u.astype(np.intp)]
+
+    if wide:
+        # Off the table E is 0 or 1 to within 1e-5, so only the damping is left
+        k = np.float32(Klocal)
+        far_loss = delta < -FAST_LUT_RANGE
+        far_loss[..., window:] = False
+        far_win = delta > FAST_LUT_RANGE
+        far_win[..., :window] = False
+        contrib[far_loss] = -k / (1.0 - delta[far_loss] / np.float32(100.0))
+        contrib[far_win] = k / (1.0 + delta[far_win] / np.float32(100.0))
+    return contrib
+
+
+# --------------------------------------------
+# Instrumentation
+# --------------------------------------------
+
+class EloProfiler:
+    """
+    Opt-in counters for the update path. Pass one as profiler= to
+    apply_race_update, update_from_race_results, backfill_packed or
+    backfill_all_races; when no profiler is passed the only cost is an
+    `is None` check per call.
+
+    Records wall time per stage (STAGES), races and results processed, a
+    power-of-two field-size histogram and how many rating changes hit the
+    max_change clip. Export with to_dict / to_json; `callback` (if given)
+    receives to_dict() every `report_every` races and when a backfill ends.
+    """
+    STAGES = ("pack", "get_many", "local", "bulk", "clip", "set_many", "summary")
+
+    def __init__(self, callback: Optional[Any] = None, report_every: int = 0):
+        self.callback = callback
+        self.report_every = int(report_every)
+        self.reset()
+
+    def reset(self) -> None:
+        self.stage_seconds: Dict[str, float] = dict.fromkeys(self.STAGES, 0.0)
+        self.races = 0
+        self.results = 0
+        self.clip_hits = 0
+        self.wall_seconds = 0.0
+        # bucket b counts fields with 2**(b-1) <= n < 2**b (bucket 0: empty)
+        self.field_size_buckets = np.zeros(33, dtype=np.int64)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stage_seconds[stage] += seconds
+
+    def record_race(self, n: int, clip_hits: int) -> None:
+        self.races += 1
+        self.results += int(n)
+        self.clip_hits += int(clip_hits)
+        self.field_size_buckets[min(int(n).bit_length(), 32)] += 1
+        if self.callback is not None and self.report_every and self.races % self.report_every == 0:
+            self.callback(self.to_dict())
+
+    def add_wall(self, seconds: float) -> None:
+        self.wall_seconds += seconds
+
+    def emit(self) -> None:
+        if self.callback is not None:
+            self.callback(self.to_dict())
+
+    def field_size_histogram(self) -> Dict[str, int]:
+        hist = {}
+        for b in np.flatnonzero(self.field_size_buckets):
+            label = "0" if b == 0 else f"{1 << (b - 1)}-{(1 << b) - 1}"
+            hist[label] = int(self.field_size_buckets[b])
+        return hist
+
+    def to_dict(self) -> Dict[str, Any]:
+        seconds = self.wall_seconds or sum(self.stage_seconds.values())
+        return {
+            "races": self.races,
+            "results": self.results,
+            "seconds": seconds,
+            "races_per_sec": self.races / seconds if seconds else 0.0,
+            "results_per_sec": self.results / seconds if seconds else 0.0,
+            "stage_seconds": dict(self.stage_seconds),
+            "clip_hits": self.clip_hits,
+            "field_sizes": self.field_size_histogram(),
+        }
+
+    def to_json(self, path: Union[str, Path, None] = None) -> str:
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            Path(path).write_text(text)
+        return text
+
+
 # --------------------------------------------
 # Rating store + backfill + incremental updates
 # --------------------------------------------
 
+def _decayed(ratings: np.ndarray, last_raced: np.ndarray, at: float, half_life: float, target: float) -> np.ndarray:
+    # Exponential pull toward target over the days between last_raced and at
+    days = (at - last_raced) / 86400.0
+    factor = np.exp2(-np.maximum(days, 0.0) / half_life)
+    factor[np.isnan(factor)] = 1.0  # never raced, or no time given
+    return target + (ratings - target) * factor
+
+
 class EloStore:
     """
     Minimal in-memory store. In production you’d persist this to MongoDB.
+
+    Athlete IDs are interned to dense integer indices (0..len-1, in first-seen
+    order) and ratings live in a growable contiguous float64 array, so the
+    *_idx methods are single fancy-index operations. The string-keyed methods
+    are thin wrappers that translate IDs to indices first.
+
+    A store opened from a snapshot (load_snapshot) keeps the snapshot's
+    athletes in memory-mapped arrays: indices below _n_frozen resolve through
+    a binary search of the mapped, sorted ID table and are cached in _index
+    on first use, so opening costs O(1) regardless of athlete count.
+
+    Inactivity decay (decay_half_life, in days) is lazy: the store keeps each
+    athlete's last-raced time and pulls a rating toward decay_target by
+    2 ** (-days_since_last_race / decay_half_life) only when it is read, so
+    athletes who never race again cost nothing. The engine reads and writes
+    at the race date; user-facing reads default to the latest race time seen.
     """
-    def __init__(self, base_elo: float = 1400.0):
+    SNAPSHOT_FORMAT = 1
+
+    def __init__(
+        self,
+        base_elo: float = 1400.0,
+        capacity: int = 1024,
+        decay_half_life: Optional[float] = None,
+        decay_target: Optional[float] = None
+    ):
         self.base_elo = float(base_elo)
-        self._elos: Dict[str, float] = {}
+        self.decay_half_life = decay_half_life
+        self.decay_target = self.base_elo if decay_target is None else float(decay_target)
+        self._index: Dict[str, int] = {}
+        self._ids: List[str] = []  # IDs for indices >= _n_frozen
+        self._elos = np.full(max(int(capacity), 1), self.base_elo, dtype=np.float64)
+        # Last race time per athlete (epoch seconds, NaN = unknown / never)
+        self._last_raced = np.full(self._elos.size, np.nan, dtype=np.float64)
+        self._clock = np.nan  # latest race time seen
+        # Memory-mapped snapshot tier (see load_snapshot)
+        self._n_frozen = 0
+        self._frozen_ids: Optional[np.ndarray] = None      # bytes, index order
+        self._frozen_sorted: Optional[np.ndarray] = None   # bytes, sorted
+        self._frozen_order: Optional[np.ndarray] = None    # index of each sorted ID
+        # Caller-defined marker of the last race folded into these ratings
+        self.watermark: Any = None
+        self._ranking: Optional["RankingIndex"] = None
+
+    def __len__(self) -> int:
+        return self._n_frozen + len(self._ids)
+
+    def __contains__(self, athlete_id: str) -> bool:
+        return self.lookup([athlete_id])[0] >= 0
+
+    @property
+    def athlete_ids(self) -> List[str]:
+        """Interned IDs; position i is the athlete with index i. O(n) for snapshot-backed stores."""
+        if not self._n_frozen:
+            return self._ids
+        return [b.decode("utf-8") for b in self._frozen_ids.tolist()] + self._ids
+
+    @property
+    def ratings(self) -> np.ndarray:
+        """View of the ratings of all interned athletes, aligned with athlete_ids."""
+        return self._elos[:len(self)]
+
+    def athlete_id(self, i: int) -> str:
+        if i < self._n_frozen:
+            return self._frozen_ids[i].decode("utf-8")
+        return self._ids[i - self._n_frozen]
+
+    def _reserve(self, size: int) -> None:
+        cap = self._elos.size
+        if size <= cap:
+            return
+        while cap < size:
+            cap *= 2
+        self._resize(cap)
 
-    def get_many(self, athlete_ids: List[str]) -> np.ndarray:
-        return np.array([self._elos.get(a, self.base_elo) for a in athlete_ids], dtype=np.float64)
+    def _resize(self, cap: int) -> None:
+        """Grow every per-athlete array to `cap` slots (subclasses extend this)."""
+        grown = np.full(cap, self.base_elo, dtype=np.float64)
+        grown[:self._elos.size] = self._elos
+        self._elos = grown
+        last = np.full(cap, np.nan, dtype=np.float64)
+        last[:self._last_raced.size] = self._last_raced
+        self._last_raced = last
+
+    def _frozen_lookup(self, athlete_ids: List[str]) -> np.ndarray:
+        keys = [a.encode("utf-8") for a in athlete_ids]
+        width = self._frozen_sorted.dtype.itemsize
+        fits = np.array([len(k) <= width for k in keys], dtype=bool)
+        keys_arr = np.array(keys, dtype=self._frozen_sorted.dtype)
+        pos = np.searchsorted(self._frozen_sorted, keys_arr)
+        np.clip(pos, 0, self._n_frozen - 1, out=pos)
+        hit = fits & (self._frozen_sorted[pos] == keys_arr)
+        return np.where(hit, self._frozen_order[pos], -1).astype(np.int64)
+
+    def intern(self, athlete_ids: Iterable[str]) -> np.ndarray:
+        """
+        Map IDs to indices, assigning new indices (at base_elo) to unseen IDs.
+        """
+        athlete_ids = list(athlete_ids)
+        idx = self.lookup(athlete_ids)
+        missing = np.flatnonzero(idx < 0)
+        if missing.size:
+            index = self._index
+            ids = self._ids
+            for k in missing:
+                a = athlete_ids[k]
+                i = index.get(a)  # repeated within this call
+                if i is None:
+                    i = self._n_frozen + len(ids)
+                    index[a] = i
+                    ids.append(a)
+                idx[k] = i
+            self._reserve(len(self))
+        return idx
+
+    def lookup(self, athlete_ids: Iterable[str], cache: bool = True) -> np.ndarray:
+        """
+        Map IDs to indices without interning; unknown IDs map to -1.
+        cache=False skips caching snapshot IDs found on the way in _index.
+        """
+        athlete_ids = list(athlete_ids)
+        index = self._index
+        idx = np.array([index.get(a, -1) for a in athlete_ids], dtype=np.int64)
+        if self._n_frozen:
+            miss = np.flatnonzero(idx < 0)
+            if miss.size:
+                found = self._frozen_lookup([athlete_ids[k] for k in miss])
+                idx[miss] = found
+                if cache:
+                    for k, i in zip(miss, found):
+                        if i >= 0:
+                            index[athlete_ids[k]] = int(i)
+        return idx
+
+    @property
+    def clock(self) -> float:
+        """Latest race time (epoch seconds) written to the store, NaN if none."""
+        return self._clock
+
+    def _decay(self, idx: np.ndarray, ratings: np.ndarray, at: float) -> np.ndarray:
+        return _decayed(ratings, self._last_raced[idx], at, self.decay_half_life, self.decay_target)
+
+    def get_many_idx(self, idx: np.ndarray, at: Optional[float] = None) -> np.ndarray:
+        """
+        Ratings by index. With decay enabled and `at` (epoch seconds) given,
+        ratings are decayed to that time; without `at` the stored values.
+        """
+        if self.decay_half_life is None or at is None:
+            return self._elos[idx]
+        return self._decay(idx, self._elos[idx], at)
+
+    def set_many_idx(self, idx: np.ndarray, new_elos: np.ndarray, at: Optional[float] = None) -> None:
+        """Store ratings by index; `at` (epoch seconds) records when they were earned."""
+        self._elos[idx] = new_elos
+        if self._ranking is not None:
+            self._ranking.mark(idx)
+        if at is not None and not np.isnan(at):
+            self._last_raced[idx] = at
+            if not at <= self._clock:
+                self._clock = at
+
+    def get_many(self, athlete_ids: List[str], at: Any = None) -> np.ndarray:
+        """Ratings by ID, decayed to `at` (default: the store clock); base_elo if unknown."""
+        idx = self.lookup(athlete_ids)
+        out = self.get_many_idx(idx, at=self._read_time(at))
+        out[idx < 0] = self.base_elo
+        return out
+
+    def peek_many(self, athlete_ids: List[str], at: Any = None) -> np.ndarray:
+        """
+        Ratings as update_from_race_results reads them: decayed to `at` when
+        given, the stored values otherwise; base_elo if unknown. Interns
+        nothing and leaves every cache untouched.
+        """
+        idx = self.lookup(athlete_ids, cache=False)
+        out = np.full(idx.size, self.base_elo, dtype=np.float64)
+        known = idx >= 0
+        out[known] = EloStore.get_many_idx(self, idx[known], at=None if at is None else _to_timestamp(at))
+        return out
+
+    def _read_time(self, at: Any) -> Optional[float]:
+        if self.decay_half_life is None:
+            return None
+        return self._clock if at is None else _to_timestamp(at)
+
+    def current_ratings(self, at: Any = None) -> np.ndarray:
+        """All ratings (aligned with athlete_ids), decayed to `at` (default: the store clock)."""
+        n = len(self)
+        return self.get_many_idx(np.arange(n), at=self._read_time(at))
 
     def set_many(self, athlete_ids: List[str], new_elos: np.ndarray) -> None:
-        for a, r in zip(athlete_ids, new_elos):
-            self._elos[a] = float(r)
+        self.set_many_idx(self.intern(athlete_ids), np.asarray(new_elos, dtype=np.float64))
+
+    def checkpoint_state(self) -> np.ndarray:
+        """Index-aligned copy of what restore_ratings needs: ratings, plus last-raced times when decaying."""
+        if self.decay_half_life is None:
+            return self.ratings.copy()
+        return np.stack((self.ratings, self._last_raced[:len(self)]))
+
+    def restore_ratings(self, ratings: np.ndarray) -> None:
+        """
+        Reset ratings to a saved copy (index-aligned; 2-D copies from
+        checkpoint_state also restore last-raced times). Athletes interned
+        after the copy was taken go back to base_elo.
+        """
+        state = np.asarray(ratings)
+        ratings = state[0] if state.ndim == 2 else state
+        n = min(len(ratings), len(self))
+        self._elos[:n] = ratings[:n]
+        self._elos[n:len(self)] = self.base_elo
+        if self._ranking is not None:
+            self._ranking.invalidate()
+        if state.ndim == 2:
+            self._last_raced[:n] = state[1, :n]
+            self._last_raced[n:len(self)] = np.nan
+            valid = self._last_raced[:len(self)]
+            self._clock = float(np.nanmax(valid)) if np.isfinite(valid).any() else np.nan
 
     def to_dataframe(self) -> pd.DataFrame:
-        return pd.DataFrame({"Athlete": list(self._elos.keys()), "ELO": list(self._elos.values())}).sort_values("ELO", ascending=False)
+        return pd.DataFrame({"Athlete": list(self.athlete_ids), "ELO": self.current_ratings()}).sort_values("ELO", ascending=False)
+
+    def ranking(self) -> "RankingIndex":
+        """The store's RankingIndex, created on first use and kept current by set_many*."""
+        if self._ranking is None:
+            self._ranking = RankingIndex(self)
+        return self._ranking
+
+    # ---- binary snapshots ----
+
+    def save_snapshot(self, path: Union[str, Path]) -> None:
+        """
+        Write the store to a snapshot directory:
+          ratings.npy  float64, index order (including spare capacity)
+          last_raced.npy  float64 epoch seconds, same layout
+          ids.npy      UTF-8 bytes, index order
+          sorted_ids.npy / sorted_order.npy  ID table sorted for lookups
+          meta.json    base_elo, athlete count, watermark, decay settings, clock
+        The directory is built next to `path` and swapped in at the end, so
+        readers never see a half-written snapshot.
+        """
+        path = Path(path)
+        n = len(self)
+        tail = np.array([a.encode("utf-8") for a in self._ids], dtype=bytes)
+        if self._n_frozen:
+            ids = np.concatenate((np.asarray(self._frozen_ids), tail)) if tail.size else np.asarray(self._frozen_ids)
+        else:
+            ids = tail if tail.size else np.zeros(0, dtype="S1")
+        order = np.argsort(ids, kind="mergesort").astype(np.int64)
+
+        tmp = path.with_name(path.name + ".tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "ratings.npy", np.asarray(self._elos))
+        np.save(tmp / "last_raced.npy", np.asarray(self._last_raced))
+        np.save(tmp / "ids.npy", ids)
+        np.save(tmp / "sorted_ids.npy", ids[order])
+        np.save(tmp / "sorted_order.npy", order)
+        meta = {
+            "format": self.SNAPSHOT_FORMAT,
+            "base_elo": self.base_elo,
+            "count": n,
+            "watermark": self.watermark,
+            "decay_half_life": self.decay_half_life,
+            "decay_target": self.decay_target,
+            "clock": None if np.isnan(self._clock) else self._clock,
+        }
+        meta.update(self._save_snapshot_extras(tmp))
+        (tmp / "meta.json").write_text(json.dumps(meta))
+
+        old = path.with_name(path.name + ".old")
+        if path.exists():
+            if old.exists():
+                shutil.rmtree(old)
+            path.rename(old)
+        tmp.rename(path)
+        if old.exists():
+            shutil.rmtree(old)
+
+    @classmethod
+    def load_snapshot(cls, path: Union[str, Path], mmap: bool = True) -> "EloStore":
+        """
+        Open a snapshot written by save_snapshot. With mmap=True every array is
+        np.memmap'd copy-on-write: nothing is read until touched, and rating
+        updates stay in memory until the next save_snapshot.
+        """
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        if meta.get("format") != cls.SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format: {meta.get('format')!r}")
+        mode = "c" if mmap else None
+
+        store = cls(
+            base_elo=meta["base_elo"],
+            capacity=1,
+            decay_half_life=meta.get("decay_half_life"),
+            decay_target=meta.get("decay_target"),
+        )
+        store.watermark = meta.get("watermark")
+        store._clock = np.nan if meta.get("clock") is None else float(meta["clock"])
+        n = int(meta["count"])
+        store._elos = np.load(path / "ratings.npy", mmap_mode=mode)
+        store._last_raced = np.load(path / "last_raced.npy", mmap_mode=mode)
+        if n:
+            store._n_frozen = n
+            store._frozen_ids = np.load(path / "ids.npy", mmap_mode="r" if mmap else None)
+            store._frozen_sorted = np.load(path / "sorted_ids.npy", mmap_mode="r" if mmap else None)
+            store._frozen_order = np.load(path / "sorted_order.npy", mmap_mode="r" if mmap else None)
+        store._load_snapshot_extras(path, meta, mmap)
+        return store
+
+    def _save_snapshot_extras(self, directory: Path) -> Dict[str, Any]:
+        """Hook for subclasses: write extra arrays, return extra meta fields."""
+        return {}
+
+    def _load_snapshot_extras(self, directory: Path, meta: Dict[str, Any], mmap: bool) -> None:
+        """Hook for subclasses: read what _save_snapshot_extras wrote."""
+
+
+# --------------------------------------------
+# Ranking index (order statistics)
+# --------------------------------------------
+
+class RankingIndex:
+    """
+    Athletes kept sorted by rating, best first, for the rankings page:
+    top_k, rank_of and percentile_of without sorting the store per query.
+
+    Writes only mark athletes dirty (EloStore.set_many_idx calls mark); the
+    next query folds them in with one merge, O(n + m log m) for m changed
+    athletes, then answers by binary search: rank_of / percentile_of are
+    O(log n) per athlete and top_k is O(k). Newly interned athletes join at
+    base_elo. Ranks use competition ranking (ties share the best rank).
+
+    With inactivity decay enabled, ratings are decayed to the store clock,
+    as get_many / to_dataframe show them, so inactive athletes drift down
+    the rankings. Every athlete's decayed rating moves when the clock does,
+    so the first query after a dated race rebuilds the index.
+    """
+    # Rebuild with one sort instead of merging when this share of athletes changed
+    REBUILD_FRACTION = 0.125
+
+    def __init__(self, store: EloStore):
+        self.store = store
+        self._keys = np.empty(0, dtype=np.float64)   # -rating, ascending
+        self._order = np.empty(0, dtype=np.int64)    # athlete index at each key
+        self._indexed = np.empty(0, dtype=np.float64)  # rating each athlete is filed under
+        self._pending: List[np.ndarray] = []
+        self._stale = True
+        self._clock = np.nan  # store clock the ratings were decayed to
+
+    def __len__(self) -> int:
+        self._refresh()
+        return self._order.size
+
+    def mark(self, idx: np.ndarray) -> None:
+        """Record that these athletes' stored ratings may have changed."""
+        self._pending.append(np.array(idx, dtype=np.int64).ravel())
+
+    def invalidate(self) -> None:
+        """Force a full rebuild on the next query (after bulk rating rewrites)."""
+        self._pending.clear()
+        self._stale = True
+
+    def _ratings(self, idx: np.ndarray) -> np.ndarray:
+        # Cached ratings (no Mongo reads), decayed to the store clock
+        return EloStore.get_many_idx(self.store, idx, at=self.store._read_time(None))
+
+    def _rebuild(self) -> None:
+        ratings = self._ratings(np.arange(len(self.store)))
+        self._clock = self.store.clock
+        order = np.argsort(-ratings, kind="stable")
+        self._order = order.astype(np.int64)
+        self._keys = -ratings[order]
+        self._indexed = ratings
+        self._pending.clear()
+        self._stale = False
+
+    def _refresh(self) -> None:
+        clock = self.store.clock
+        moved_clock = self.store.decay_half_life is not None and not (
+            clock == self._clock or (np.isnan(clock) and np.isnan(self._clock))
+        )
+        if self._stale or moved_clock:
+            self._rebuild()
+            return
+        n = len(self.store)
+        n_old = self._indexed.size
+        if not self._pending and n_old == n:
+            return
+
+        changed = np.unique(np.concatenate(self._pending)) if self._pending else np.empty(0, dtype=np.int64)
+        self._pending.clear()
+        changed = changed[changed < n_old]
+        moved = changed[self._ratings(changed) != self._indexed[changed]]
+        incoming = np.concatenate((moved, np.arange(n_old, n, dtype=np.int64)))
+        if incoming.size == 0:
+            return
+        if incoming.size > self.REBUILD_FRACTION * n:
+            self._rebuild()
+            return
+
+        keys, order = self._keys, self._order
+        if moved.size:
+            gone = np.zeros(n_old, dtype=bool)
+            gone[moved] = True
+            keep = ~gone[order]
+            keys, order = keys[keep], order[keep]
+
+        indexed = np.empty(n, dtype=np.float64)
+        indexed[:n_old] = self._indexed
+        indexed[incoming] = self._ratings(incoming)
+        self._indexed = indexed
+
+        new_keys = -indexed[incoming]
+        by_key = np.argsort(new_keys, kind="stable")
+        new_keys, incoming = new_keys[by_key], incoming[by_key]
+        at = np.searchsorted(keys, new_keys, side="right")
+        self._keys = np.insert(keys, at, new_keys)
+        self._order = np.insert(order, at, incoming)
+
+    def top_k_idx(self, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(athlete indices, ratings, ranks) of the k best athletes."""
+        self._refresh()
+        k = max(0, min(int(k), self._order.size))
+        keys = self._keys[:k]
+        ranks = np.searchsorted(self._keys, keys, side="left") + 1
+        return self._order[:k].copy(), -keys, ranks
+
+    def top_k(self, k: int = 10) -> pd.DataFrame:
+        idx, ratings, ranks = self.top_k_idx(k)
+        return pd.DataFrame({
+            "Rank": ranks,
+            "Athlete": [self.store.athlete_id(i) for i in idx],
+            "ELO": ratings,
+        })
+
+    def rank_of_idx(self, idx: np.ndarray) -> np.ndarray:
+        """1-based rank per athlete index (1 + athletes rated strictly higher)."""
+        self._refresh()
+        idx = np.asarray(idx, dtype=np.int64)
+        return np.searchsorted(self._keys, -self._indexed[idx], side="left") + 1
+
+    def rank_of(self, athlete_ids: Iterable[str]) -> np.ndarray:
+        """1-based ranks by ID; -1 for unknown athletes."""
+        idx = self.store.lookup(athlete_ids)
+        ranks = np.full(idx.size, -1, dtype=np.int64)
+        known = idx >= 0
+        ranks[known] = self.rank_of_idx(idx[known])
+        return ranks
+
+    def percentile_of(self, athlete_ids: Iterable[str]) -> np.ndarray:
+        """rank / athletes * 100 (lower is better, as for race results); NaN if unknown."""
+        ranks = self.rank_of(athlete_ids)
+        out = np.full(ranks.size, np.nan, dtype=np.float64)
+        known = ranks > 0
+        out[known] = ranks[known] / len(self) * 100.0
+        return out
+
+
+# --------------------------------------------
+# Rating history (append-only, columnar)
+# --------------------------------------------
+
+HISTORY_DTYPE = np.dtype([
+    ("race", np.int64),
+    ("date", "datetime64[s]"),
+    ("athlete", np.int64),
+    ("old", np.float64),
+    ("new", np.float64),
+    ("delta", np.float64),
+])
+
+
+def _to_datetime64(value: Any) -> np.datetime64:
+    """Race date (datetime, ISO string, datetime64, or None) as naive-UTC datetime64[s]."""
+    if value is None:
+        return np.datetime64("NaT", "s")
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return np.datetime64(value, "s")
+    if isinstance(value, str):
+        return _to_datetime64(datetime.fromisoformat(value.strip().replace("Z", "+00:00")))
+    return np.datetime64(value, "s")
+
+
+def _to_timestamp(value: Any) -> float:
+    """Race date (see _to_datetime64) or epoch seconds as float epoch seconds; NaN if unknown."""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    stamp = _to_datetime64(value)
+    return np.nan if np.isnat(stamp) else float(stamp.astype(np.int64))
+
+
+class RatingHistory:
+    """
+    Append-only log of rating changes, one row per (race, athlete):
+    race index, athlete index (EloStore indices), old, new, delta.
+
+    Rows go into a preallocated open chunk; full chunks are sealed together
+    with an athlete-sorted permutation, so an athlete's trajectory is one
+    binary search per chunk and "ratings as of race k / date D" is a scan of
+    the chunks up to k with no rating math. Races get consecutive indices in
+    append order and an optional date (must be non-decreasing for as_of).
+    """
+    COLUMNS = ("race", "athlete", "old", "new", "delta")
+    _COLUMN_DTYPES = {"race": np.int64, "athlete": np.int64, "old": np.float64, "new": np.float64, "delta": np.float64}
+
+    def __init__(self, chunk_size: int = 1 << 16):
+        self.chunk_size = int(chunk_size)
+        self._chunks: List[Dict[str, np.ndarray]] = []
+        self._open = self._empty_chunk(self.chunk_size)
+        self._fill = 0
+        self._race_dates: List[np.datetime64] = []
+
+    @classmethod
+    def _empty_chunk(cls, size: int) -> Dict[str, np.ndarray]:
+        return {name: np.empty(size, dtype=dt) for name, dt in cls._COLUMN_DTYPES.items()}
+
+    @staticmethod
+    def _index_chunk(chunk: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        perm = np.argsort(chunk["athlete"], kind="mergesort")
+        chunk["by_athlete"] = perm
+        chunk["athlete_sorted"] = chunk["athlete"][perm]
+        return chunk
+
+    def _seal(self) -> None:
+        if self._fill == 0:
+            return
+        chunk = {name: col[:self._fill].copy() for name, col in self._open.items()}
+        self._chunks.append(self._index_chunk(chunk))
+        self._open = self._empty_chunk(self.chunk_size)
+        self._fill = 0
+
+    def _all_chunks(self) -> List[Dict[str, np.ndarray]]:
+        if self._fill == 0:
+            return self._chunks
+        tail = {name: col[:self._fill] for name, col in self._open.items()}
+        return self._chunks + [self._index_chunk(tail)]
+
+    @property
+    def n_races(self) -> int:
+        return len(self._race_dates)
+
+    @property
+    def n_rows(self) -> int:
+        return sum(c["race"].size for c in self._chunks) + self._fill
+
+    @property
+    def race_dates(self) -> np.ndarray:
+        return np.array(self._race_dates, dtype="datetime64[s]")
+
+    def append(self, athlete_idx: np.ndarray, old: np.ndarray, new: np.ndarray, date: Any = None) -> int:
+        """Log one race; returns its race index."""
+        stamp = _to_datetime64(date)
+        if self._race_dates and not np.isnat(stamp) and not np.isnat(self._race_dates[-1]) and stamp < self._race_dates[-1]:
+            raise ValueError("race dates must be non-decreasing")
+        race = len(self._race_dates)
+        self._race_dates.append(stamp)
+
+        athlete_idx = np.asarray(athlete_idx, dtype=np.int64)
+        old = np.asarray(old, dtype=np.float64)
+        new = np.asarray(new, dtype=np.float64)
+        start = 0
+        while start < athlete_idx.size:
+            take = min(athlete_idx.size - start, self.chunk_size - self._fill)
+            dst = slice(self._fill, self._fill + take)
+            src = slice(start, start + take)
+            self._open["race"][dst] = race
+            self._open["athlete"][dst] = athlete_idx[src]
+            self._open["old"][dst] = old[src]
+            self._open["new"][dst] = new[src]
+            self._open["delta"][dst] = new[src] - old[src]
+            self._fill += take
+            start += take
+            if self._fill == self.chunk_size:
+                self._seal()
+        return race
+
+    def rows(self) -> np.ndarray:
+        """Every row in append order (HISTORY_DTYPE)."""
+        chunks = self._all_chunks()
+        out = np.empty(sum(c["race"].size for c in chunks), dtype=HISTORY_DTYPE)
+        pos = 0
+        for chunk in chunks:
+            sl = slice(pos, pos + chunk["race"].size)
+            for name in self.COLUMNS:
+                out[name][sl] = chunk[name]
+            pos = sl.stop
+        out["date"] = self.race_dates[out["race"]] if out.size else out["date"]
+        return out
+
+    def trajectory(self, athlete: int) -> np.ndarray:
+        """All rows for one athlete index, in race order (HISTORY_DTYPE)."""
+        parts = []
+        for chunk in self._all_chunks():
+            lo, hi = np.searchsorted(chunk["athlete_sorted"], [athlete, athlete + 1])
+            if hi > lo:
+                parts.append((chunk, chunk["by_athlete"][lo:hi]))
+
+        out = np.empty(sum(rows.size for _, rows in parts), dtype=HISTORY_DTYPE)
+        dates = self.race_dates
+        pos = 0
+        for chunk, rows in parts:
+            sl = slice(pos, pos + rows.size)
+            for name in self.COLUMNS:
+                out[name][sl] = chunk[name][rows]
+            out["date"][sl] = dates[chunk["race"][rows]]
+            pos += rows.size
+        return out
+
+    def as_of_race(self, race: int, n_athletes: int, base_elo: float = np.nan) -> np.ndarray:
+        """
+        Ratings of athletes 0..n_athletes-1 right after race `race`
+        (base_elo for athletes who had not raced yet).
+        """
+        ratings = np.full(int(n_athletes), base_elo, dtype=np.float64)
+        for chunk in self._all_chunks():
+            races = chunk["race"]
+            if races.size == 0 or races[0] > race:
+                break
+            cut = np.searchsorted(races, race, side="right")
+            athletes = chunk["athlete"][:cut]
+            # Last row per athlete within the chunk wins
+            uniq, first_rev = np.unique(athletes[::-1], return_index=True)
+            ratings[uniq] = chunk["new"][cut - 1 - first_rev]
+        return ratings
+
+    def as_of(self, date: Any, n_athletes: int, base_elo: float = np.nan) -> np.ndarray:
+        """Ratings after the last race dated on or before `date`."""
+        race = int(np.searchsorted(self.race_dates, _to_datetime64(date), side="right")) - 1
+        if race < 0:
+            return np.full(int(n_athletes), base_elo, dtype=np.float64)
+        return self.as_of_race(race, n_athletes, base_elo)
+
+    def save(self, directory: Union[str, Path], fmt: str = "npz") -> None:
+        """Write one file per chunk (npz, or parquet via pandas/pyarrow) plus races.npy."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._seal()
+        np.save(directory / "races.npy", self.race_dates)
+        for k, chunk in enumerate(self._chunks):
+            cols = {name: chunk[name] for name in self.COLUMNS}
+            if fmt == "parquet":
+                pd.DataFrame(cols).to_parquet(directory / f"chunk-{k:05d}.parquet", index=False)
+            elif fmt == "npz":
+                np.savez(directory / f"chunk-{k:05d}.npz", **cols)
+            else:
+                raise ValueError(f"Unknown history format: {fmt!r}")
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], chunk_size: int = 1 << 16) -> "RatingHistory":
+        directory = Path(directory)
+        history = cls(chunk_size=chunk_size)
+        history._race_dates = list(np.load(directory / "races.npy"))
+        for path in sorted(directory.glob("chunk-*")):
+            if path.suffix == ".parquet":
+                frame = pd.read_parquet(path)
+                cols = {name: frame[name].to_numpy(dtype=dt) for name, dt in cls._COLUMN_DTYPES.items()}
+            else:
+                with np.load(path) as data:
+                    cols = {name: data[name] for name in cls.COLUMNS}
+            history._chunks.append(cls._index_chunk(cols))
+        return history
+
+
+# --------------------------------------------
+# Race summaries / audit output
+# --------------------------------------------
+
+SUMMARY_DTYPE = np.dtype([
+    ("athlete", np.int64),
+    ("finish_place", np.int32),
+    ("old", np.float64),
+    ("new", np.float64),
+    ("delta", np.float64),
+])
+
+
+def race_summary_array(
+    idx: np.ndarray,
+    finish_places: np.ndarray,
+    old_elos: np.ndarray,
+    new_elos: np.ndarray,
+    delta: np.ndarray
+) -> np.ndarray:
+    """One race's summary as a SUMMARY_DTYPE structured array, sorted by finish place."""
+    order = np.argsort(finish_places, kind="mergesort")
+    out = np.empty(order.size, dtype=SUMMARY_DTYPE)
+    out["athlete"] = idx[order]
+    out["finish_place"] = finish_places[order]
+    out["old"] = old_elos[order]
+    out["new"] = new_elos[order]
+    out["delta"] = delta[order]
+    return out
+
+
+class AuditSink:
+    """
+    Streams race summaries to a CSV or Parquet file (by suffix, or fmt=) in
+    batches of ~batch_rows rows, without going through pandas. Rows are
+    (race, athlete, finish_place, old, new, delta); race counts the races
+    written to this sink and athlete IDs are resolved through `store` when a
+    batch is flushed. Use as a context manager or call close().
+    """
+    COLUMNS = ("race", "athlete", "finish_place", "old", "new", "delta")
+
+    def __init__(self, path: Union[str, Path], store: EloStore, fmt: Optional[str] = None, batch_rows: int = 100_000):
+        self.path = Path(path)
+        self.store = store
+        self.fmt = fmt or ("parquet" if self.path.suffix == ".parquet" else "csv")
+        if self.fmt not in ("csv", "parquet"):
+            raise ValueError(f"Unknown audit format: {self.fmt!r}")
+        self.batch_rows = int(batch_rows)
+        self.n_races = 0
+        self._pending: List[Tuple[int, np.ndarray]] = []
+        self._pending_rows = 0
+        self._handle = None
+        self._writer = None
+
+    def __enter__(self) -> "AuditSink":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def write(self, idx: np.ndarray, finish_places: np.ndarray, old_elos: np.ndarray, new_elos: np.ndarray, delta: np.ndarray) -> None:
+        self._pending.append((self.n_races, race_summary_array(idx, finish_places, old_elos, new_elos, delta)))
+        self._pending_rows += idx.size
+        self.n_races += 1
+        if self._pending_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        rows = np.concatenate([summary for _, summary in self._pending])
+        races = np.repeat([race for race, _ in self._pending], [summary.size for _, summary in self._pending])
+        athletes = [self.store.athlete_id(i) for i in rows["athlete"].tolist()]
+        self._pending = []
+        self._pending_rows = 0
+
+        if self.fmt == "csv":
+            if self._handle is None:
+                self._handle = self.path.open("w", newline="")
+                self._csv = csv.writer(self._handle)
+                self._csv.writerow(self.COLUMNS)
+            self._csv.writerows(zip(
+                races.tolist(), athletes, rows["finish_place"].tolist(),
+                rows["old"].tolist(), rows["new"].tolist(), rows["delta"].tolist(),
+            ))
+            return
+
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Missing dependency: pyarrow. Install with `python3 -m pip install pyarrow`.")
+        table = pa.table({
+            "race": races.astype(np.int64),
+            "athlete": pa.array(athletes, type=pa.string()),
+            "finish_place": rows["finish_place"],
+            "old": rows["old"],
+            "new": rows["new"],
+            "delta": rows["delta"],
+        })
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        self.flush()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
 
 
 def update_from_race_results(
@@ -131,27 +1243,52 @@ def update_from_race_results(
     Kglobal: float = 1.0,
     alpha: float = 0.2,
     window: int = 3,
-    max_change: Optional[float] = 20.0
-) -> pd.DataFrame:
+    max_change: Optional[float] = 20.0,
+    history: Optional[RatingHistory] = None,
+    race_date: Any = None,
+    output: Union[str, AuditSink] = "dataframe",
+    profiler: Optional[EloProfiler] = None,
+    fast_math: bool = False
+) -> Union[pd.DataFrame, np.ndarray, None]:
     """
     Incremental update for ONE race.
     athlete_ids: participants in this race
     finish_places: 1 = winner, 2 = 2nd, ...
     Updates only these athletes in the store.
-    Returns a summary dataframe for logging/auditing.
+    race_date: when the race happened; used for inactivity decay and
+    last-raced tracking, and as the date logged into `history` (optional).
+    output selects the summary returned for logging/auditing:
+      - "dataframe": pandas DataFrame (default)
+      - "array": SUMMARY_DTYPE structured array (athlete = store index)
+      - "none": nothing, cheapest
+      - an AuditSink: rows are streamed to it and nothing is returned
+    profiler: optional EloProfiler to record per-stage timings.
+    fast_math: float32 / lookup-table local updates (see fast_math_error_bound).
     """
     if len(athlete_ids) != len(finish_places):
         raise ValueError("athlete_ids and finish_places must be same length")
+    if not isinstance(output, AuditSink) and output not in ("dataframe", "array", "none"):
+        raise ValueError(f"Unknown output mode: {output!r}")
     n = len(athlete_ids)
     if n == 0:
-        return pd.DataFrame(columns=["Athlete", "Finish_Place", "Old_ELO", "New_ELO", "Delta"])
+        if output == "dataframe":
+            return pd.DataFrame(columns=["Athlete", "Finish_Place", "Old_ELO", "New_ELO", "Delta"])
+        if output == "array":
+            return np.empty(0, dtype=SUMMARY_DTYPE)
+        return None
 
     # Convert to 0-based finish positions
     finish_places_arr = np.asarray(finish_places, dtype=np.int32)
     finish_positions = finish_places_arr - 1  # 0 best
 
-    # Pull current ratings for just these athletes
-    old_elos = store.get_many(athlete_ids)
+    # Pull current ratings for just these athletes (decayed to the race date, if any)
+    at = None if race_date is None else _to_timestamp(race_date)
+    if profiler is not None:
+        t0 = time.perf_counter()
+    idx = store.intern(athlete_ids)
+    old_elos = store.get_many_idx(idx, at=at)
+    if profiler is not None:
+        profiler.add("get_many", time.perf_counter() - t0)
 
     # Update within this race subset
     new_elos, delta = apply_race_update(
@@ -161,11 +1298,43 @@ def update_from_race_results(
         Kglobal=Kglobal,
         alpha=alpha,
         window=window,
-        max_change=max_change
+        max_change=max_change,
+        profiler=profiler,
+        fast_math=fast_math
     )
 
     # Persist
-    store.set_many(athlete_ids, new_elos)
+    if profiler is not None:
+        t0 = time.perf_counter()
+    store.set_many_idx(idx, new_elos, at=at)
+    if profiler is not None:
+        t1 = time.perf_counter()
+        profiler.add("set_many", t1 - t0)
+
+    if history is not None:
+        history.append(idx, old_elos, new_elos, date=race_date)
+    summary = _summarize_race(output, athlete_ids, idx, finish_places_arr, old_elos, new_elos, delta)
+    if profiler is not None:
+        profiler.add("summary", time.perf_counter() - t1)
+    return summary
+
+
+def _summarize_race(
+    output: Union[str, AuditSink],
+    athlete_ids: List[str],
+    idx: np.ndarray,
+    finish_places_arr: np.ndarray,
+    old_elos: np.ndarray,
+    new_elos: np.ndarray,
+    delta: np.ndarray
+) -> Union[pd.DataFrame, np.ndarray, None]:
+    if isinstance(output, AuditSink):
+        output.write(idx, finish_places_arr, old_elos, new_elos, delta)
+        return None
+    if output == "none":
+        return None
+    if output == "array":
+        return race_summary_array(idx, finish_places_arr, old_elos, new_elos, delta)
 
     # Return summary for debugging/logging
     out = pd.DataFrame({
@@ -179,6 +1348,172 @@ def update_from_race_results(
     return out
 
 
+# --------------------------------------------
+# Start-list prediction
+# --------------------------------------------
+
+# Prediction model: performance = rating + Gumbel noise of this scale (rating
+# points). Then P(i ahead of j) = _expected_win_prob(r_j - r_i) exactly and the
+# finish order is Plackett-Luce with strengths 10^(r/400).
+GUMBEL_SCALE = 400.0 / np.log(10.0)
+
+
+def predict_finish(
+    ratings: np.ndarray,
+    *,
+    n_draws: int = 100_000,
+    podium: int = 3,
+    seed: Any = None,
+    chunk_elements: int = 4_000_000
+) -> Dict[str, np.ndarray]:
+    """
+    Finish predictions for one start list of pre-race ratings:
+      - "win": win probability (closed form: softmax of r * ln10 / 400)
+      - "expected_place": 1 + sum of P(j ahead of i) over the field (exact)
+      - "podium": P(place <= podium), Monte Carlo over n_draws races
+    The pairwise sums run in blocks of ~chunk_elements values.
+    """
+    r = np.asarray(ratings, dtype=np.float64)
+    n = r.size
+    if n == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return {"win": empty, "expected_place": empty.copy(), "podium": empty.copy()}
+
+    z = (r - r.max()) / GUMBEL_SCALE
+    w = np.exp(z)
+    win = w / w.sum()
+
+    expected_place = np.empty(n, dtype=np.float64)
+    rows = max(1, chunk_elements // n)
+    for lo in range(0, n, rows):
+        block = r[lo:lo + rows]
+        # P(j ahead of i) for every j; the j == i term contributes 0.5
+        expected_place[lo:lo + rows] = 0.5 + _expected_win_prob(block[:, None] - r[None, :]).sum(axis=1)
+
+    if podium >= n:
+        podium_prob = np.ones(n, dtype=np.float64)
+    else:
+        # Draw places 1..podium in sequence, Plackett-Luce style: each place is
+        # a strength-weighted pick among athletes not yet placed. Picks invert
+        # the cumulative strengths with the placed athletes' segments cut out.
+        rng = np.random.default_rng(seed)
+        cum = np.cumsum(w)
+        start = cum - w
+        placed = np.empty((n_draws, podium), dtype=np.int64)
+        taken = np.zeros(n_draws, dtype=np.float64)
+        for k in range(podium):
+            x = rng.random(n_draws) * (cum[-1] - taken)
+            for prev in np.sort(placed[:, :k], axis=1).T:
+                x += np.where(x >= start[prev], w[prev], 0.0)
+            pick = np.minimum(np.searchsorted(cum, x, side="right"), n - 1)
+            placed[:, k] = pick
+            taken += w[pick]
+        podium_prob = np.bincount(placed.ravel(), minlength=n) / n_draws
+
+    return {"win": win, "expected_place": expected_place, "podium": podium_prob}
+
+
+def predict_start_list(
+    store: EloStore,
+    athlete_ids: List[str],
+    *,
+    at: Any = None,
+    n_draws: int = 100_000,
+    podium: int = 3,
+    seed: Any = None
+) -> pd.DataFrame:
+    """
+    Race preview for an upcoming start list: win probability, expected
+    finish place and podium odds per athlete (see predict_finish), from
+    ratings decayed to `at`. Unknown athletes are rated at base_elo.
+    Sorted by expected place.
+    """
+    ratings = store.get_many(list(athlete_ids), at=at)
+    pred = predict_finish(ratings, n_draws=n_draws, podium=podium, seed=seed)
+    return pd.DataFrame({
+        "Athlete": list(athlete_ids),
+        "ELO": ratings,
+        "Win_Prob": pred["win"],
+        "Expected_Place": pred["expected_place"],
+        "Podium_Prob": pred["podium"],
+    }).sort_values("Expected_Place", kind="mergesort").reset_index(drop=True)
+
+
+# --------------------------------------------
+# What-if (read-only) updates
+# --------------------------------------------
+
+class WhatIfResult(NamedTuple):
+    """
+    old: (n,) pre-race ratings of the start list.
+    new / delta: (scenarios, n); row s is the outcome of scenario s.
+    """
+    old: np.ndarray
+    new: np.ndarray
+    delta: np.ndarray
+
+
+def what_if_batch(
+    store: EloStore,
+    athlete_ids: List[str],
+    finish_places: Any,
+    *,
+    race_date: Any = None,
+    ratings: Optional[np.ndarray] = None,
+    Klocal: float = 4.5,
+    Kglobal: float = 1.0,
+    alpha: float = 0.2,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    fast_math: bool = False
+) -> WhatIfResult:
+    """
+    Rating changes for hypothetical results of one race, without touching
+    the store. finish_places: (n,) or (scenarios, n) 1-based places, one row
+    per ordering to evaluate. Ratings are read as update_from_race_results
+    would (EloStore.peek_many: decayed to race_date if given; base_elo for
+    unknown athletes) unless `ratings` gives the pre-race values, e.g. from
+    RatingHistory when previewing a correction to a race already rated.
+    Nothing is interned or cached. All scenarios run as one
+    apply_batched_update call; numbers match update_from_race_results.
+    """
+    places = np.atleast_2d(np.asarray(finish_places, dtype=np.int32))
+    if places.shape[1] != len(athlete_ids):
+        raise ValueError("athlete_ids and finish_places must be same length")
+    if ratings is None:
+        old = store.peek_many(list(athlete_ids), at=race_date)
+    else:
+        old = np.asarray(ratings, dtype=np.float64)
+        if old.shape != (len(athlete_ids),):
+            raise ValueError("ratings must have one value per athlete")
+    new, delta = apply_batched_update(
+        np.broadcast_to(old, places.shape), places - 1,
+        Klocal=Klocal, Kglobal=Kglobal, alpha=alpha, window=window, max_change=max_change, fast_math=fast_math,
+    )
+    return WhatIfResult(old, new, delta)
+
+
+def what_if(
+    store: EloStore,
+    athlete_ids: List[str],
+    finish_places: List[int],
+    **kwargs: Any
+) -> pd.DataFrame:
+    """
+    Read-only update_from_race_results: the summary DataFrame that call
+    would return, with the store left as it was. kwargs go to what_if_batch.
+    """
+    places = np.asarray(finish_places, dtype=np.int32)
+    result = what_if_batch(store, athlete_ids, places, **kwargs)
+    return pd.DataFrame({
+        "Athlete": list(athlete_ids),
+        "Finish_Place": places,
+        "Old_ELO": result.old,
+        "New_ELO": result.new[0],
+        "Delta": result.delta[0]
+    }).sort_values("Finish_Place").reset_index(drop=True)
+
+
 def backfill_all_races(
     store: EloStore,
     races: Iterable[Dict[str, Any]],
@@ -187,25 +1522,780 @@ def backfill_all_races(
     Kglobal: float = 1.0,
     alpha: float = 0.2,
     window: int = 3,
-    max_change: Optional[float] = 20.0
+    max_change: Optional[float] = 20.0,
+    history: Optional[RatingHistory] = None,
+    audit: Optional[AuditSink] = None,
+    profiler: Optional[EloProfiler] = None,
+    fast_math: bool = False
 ) -> None:
     """
     One-time large backfill. Feed races in chronological order.
+    Races are packed into flat arrays first (see pack_races / backfill_packed).
     Each race dict should have:
       - "athlete_ids": List[str]
       - "finish_places": List[int] (1..n)
+      - "date" (optional; drives decay / last-raced tracking and `history`)
+    audit: optional AuditSink that receives every race summary.
+    profiler: optional EloProfiler (packing is recorded as the "pack" stage).
+    """
+    if profiler is not None:
+        start = time.perf_counter()
+    races = list(races)
+    race_dates = [race.get("date") for race in races]
+    if all(d is None for d in race_dates):
+        race_dates = None
+    packed = pack_races(store, races)
+    if profiler is not None:
+        elapsed = time.perf_counter() - start
+        profiler.add("pack", elapsed)
+        profiler.add_wall(elapsed)
+    backfill_packed(
+        store,
+        packed,
+        Klocal=Klocal,
+        Kglobal=Kglobal,
+        alpha=alpha,
+        window=window,
+        max_change=max_change,
+        history=history,
+        race_dates=race_dates,
+        audit=audit,
+        profiler=profiler,
+        fast_math=fast_math
+    )
+
+
+# --------------------------------------------
+# Packed (CSR) backfill
+# --------------------------------------------
+
+class PackedRaces(NamedTuple):
+    """
+    A chronological race history compiled into flat arrays (CSR layout).
+    Race r covers entries offsets[r]:offsets[r + 1] of the flat arrays.
+      - athlete_idx: store indices (see EloStore.intern)
+      - finish_positions: 0-based finish positions (0 = winner)
+      - offsets: int64, length n_races + 1, offsets[0] == 0
+    """
+    athlete_idx: np.ndarray
+    finish_positions: np.ndarray
+    offsets: np.ndarray
+
+    @property
+    def n_races(self) -> int:
+        return self.offsets.size - 1
+
+    @property
+    def n_results(self) -> int:
+        return int(self.offsets[-1])
+
+    def race(self, r: int) -> Tuple[np.ndarray, np.ndarray]:
+        lo, hi = self.offsets[r], self.offsets[r + 1]
+        return self.athlete_idx[lo:hi], self.finish_positions[lo:hi]
+
+
+def pack_races(store: EloStore, races: Iterable[Dict[str, Any]]) -> PackedRaces:
+    """
+    Compile race dicts ({"athlete_ids", "finish_places"}) into PackedRaces,
+    interning every athlete into the store along the way.
+    """
+    idx_chunks: List[np.ndarray] = []
+    pos_chunks: List[np.ndarray] = []
+    sizes: List[int] = []
+    for race in races:
+        athlete_ids = race["athlete_ids"]
+        finish_places = race["finish_places"]
+        if len(athlete_ids) != len(finish_places):
+            raise ValueError("athlete_ids and finish_places must be same length")
+        idx_chunks.append(store.intern(athlete_ids))
+        pos_chunks.append(np.asarray(finish_places, dtype=np.int32) - 1)
+        sizes.append(len(athlete_ids))
+
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    if not sizes:
+        return PackedRaces(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), offsets)
+    return PackedRaces(np.concatenate(idx_chunks), np.concatenate(pos_chunks), offsets)
+
+
+def _race_stamps(race_dates: List[Any]) -> np.ndarray:
+    # Per-race epoch seconds, NaN for undated races
+    return np.array([np.nan if d is None else _to_timestamp(d) for d in race_dates], dtype=np.float64)
+
+
+def _run_races(
+    ratings: np.ndarray,
+    athlete_idx: np.ndarray,
+    finish_positions: np.ndarray,
+    offsets: np.ndarray,
+    race_ids: Iterable[int],
+    params: Dict[str, Any],
+    stamps: Optional[np.ndarray] = None,
+    last_raced: Optional[np.ndarray] = None,
+    decay: Optional[Tuple[float, float]] = None,
+    pre: Optional[np.ndarray] = None,
+    on_race: Optional[Callable[[int, np.ndarray, np.ndarray, np.ndarray, np.ndarray], None]] = None
+) -> None:
+    """
+    The replay loop over raw index-aligned arrays, shared by backfill_packed,
+    the backfill_parallel workers and EloBacktest. Each race in race_ids
+    reads its athletes' ratings (decayed to the race time when
+    decay=(half_life, target) and the race is dated), runs apply_race_update
+    with params and writes the new ratings back in place, recording the race
+    time in last_raced. stamps: per-race epoch seconds (NaN = undated).
+    pre: entry-aligned array that receives every pre-race rating.
+    on_race(r, idx, old, new, delta) sees every race, empty ones included.
+    """
+    empty = np.empty(0, dtype=np.float64)
+    for r in race_ids:
+        lo, hi = offsets[r], offsets[r + 1]
+        idx = athlete_idx[lo:hi]
+        if hi == lo:
+            if on_race is not None:
+                on_race(r, idx, empty, empty, empty)
+            continue
+        old = ratings[idx]
+        at = np.nan if stamps is None else stamps[r]
+        if decay is not None and not np.isnan(at):
+            old = _decayed(old, last_raced[idx], at, *decay)
+        if pre is not None:
+            pre[lo:hi] = old
+        new_elos, delta = apply_race_update(old, finish_positions[lo:hi], **params)
+        ratings[idx] = new_elos
+        if not np.isnan(at):
+            last_raced[idx] = at
+        if on_race is not None:
+            on_race(r, idx, old, new_elos, delta)
+
+
+def _read_for_replay(store: EloStore, members: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Index-aligned copies of the store's ratings and last-raced times for
+    _run_races. `members` are read through get_many_idx, so a MongoEloStore
+    fetches them (with their versions) instead of using its cache.
+    """
+    ratings = np.array(store.ratings, dtype=np.float64)
+    ratings[members] = store.get_many_idx(members)
+    return ratings, store._last_raced[:len(store)].copy()
+
+
+def _write_replayed(
+    store: EloStore,
+    members: np.ndarray,
+    ratings: np.ndarray,
+    last_raced: Optional[np.ndarray],
+    stamps: Optional[np.ndarray],
+    offsets: np.ndarray,
+    races: range
+) -> None:
+    """
+    Write the replayed ratings of `members` back through set_many_idx, one
+    call per last-raced time so the store records it, and move the store
+    clock to the latest dated race in `races`, as per-race writes would.
+    """
+    if stamps is None:
+        store.set_many_idx(members, ratings[members])
+        return
+    last = last_raced[members]
+    dated = ~np.isnan(last)
+    if not dated.all():
+        store.set_many_idx(members[~dated], ratings[members[~dated]])
+    times, groups = np.unique(last[dated], return_inverse=True)
+    order = np.argsort(groups, kind="mergesort")
+    bounds = np.searchsorted(groups[order], np.arange(times.size + 1))
+    for t in range(times.size):
+        group = members[dated][order[bounds[t]:bounds[t + 1]]]
+        store.set_many_idx(group, ratings[group], at=float(times[t]))
+
+    raced = stamps[races.start:races.stop][np.diff(offsets[races.start:races.stop + 1]) > 0]
+    if np.isfinite(raced).any() and not np.nanmax(raced) <= store._clock:
+        store._clock = float(np.nanmax(raced))
+
+
+def backfill_packed(
+    store: EloStore,
+    packed: PackedRaces,
+    *,
+    Klocal: float = 4.5,
+    Kglobal: float = 1.0,
+    alpha: float = 0.2,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    history: Optional[RatingHistory] = None,
+    race_dates: Optional[List[Any]] = None,
+    audit: Optional[AuditSink] = None,
+    checkpoints: Optional["RatingCheckpoints"] = None,
+    start: int = 0,
+    profiler: Optional[EloProfiler] = None,
+    fast_math: bool = False
+) -> None:
+    """
+    Run a packed chronological history through the kernels (_run_races on
+    index-aligned arrays read from the store once, written back before every
+    checkpoint and at the end). No per-race DataFrame or list conversion.
+    Gives the same ratings, last-raced times and clock as calling
+    update_from_race_results per race.
+    race_dates: per-race dates (decay / last-raced tracking, history).
+    history: optional RatingHistory to log every race into (empty races are
+    logged too, so history race indices match packed ones).
+    audit: optional AuditSink that receives every non-empty race summary.
+    checkpoints / start: save ratings every checkpoints.every races, and
+    begin at race position `start` (see resume_backfill / rerate_from).
+    profiler: optional EloProfiler; its callback gets a final report.
+    fast_math: float32 / lookup-table local updates (see fast_math_error_bound).
+    """
+    if profiler is not None:
+        wall_start = time.perf_counter()
+    athlete_idx, finish_positions, offsets = packed
+    n_races = offsets.size - 1
+    stamps = None if race_dates is None else _race_stamps(race_dates)
+    decay = None if store.decay_half_life is None else (store.decay_half_life, store.decay_target)
+    params = dict(
+        Klocal=Klocal, Kglobal=Kglobal, alpha=alpha, window=window, max_change=max_change,
+        profiler=profiler, fast_math=fast_math
+    )
+
+    def log_race(r: int, idx: np.ndarray, old: np.ndarray, new: np.ndarray, delta: np.ndarray) -> None:
+        if profiler is not None:
+            t0 = time.perf_counter()
+        if history is not None:
+            history.append(idx, old, new, date=race_dates[r] if race_dates else None)
+        if audit is not None and idx.size:
+            audit.write(idx, finish_positions[offsets[r]:offsets[r + 1]] + 1, old, new, delta)
+        if profiler is not None:
+            profiler.add("summary", time.perf_counter() - t0)
+
+    # Replay on index-aligned copies; the store is written back before every
+    # checkpoint and at the end
+    if profiler is not None:
+        t0 = time.perf_counter()
+    ratings, last_raced = _read_for_replay(store, np.unique(athlete_idx[offsets[min(start, n_races)]:]))
+    if profiler is not None:
+        profiler.add("get_many", time.perf_counter() - t0)
+
+    every = checkpoints.every if checkpoints is not None else max(n_races, 1)
+    bounds = [start, *range((start // every + 1) * every, n_races, every), n_races] if start < n_races else []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        if checkpoints is not None and a % every == 0:
+            checkpoints.save(a, store.checkpoint_state())
+        _run_races(
+            ratings, athlete_idx, finish_positions, offsets, range(a, b), params, stamps, last_raced, decay,
+            on_race=log_race if history is not None or audit is not None else None
+        )
+        if profiler is not None:
+            t0 = time.perf_counter()
+        members = np.unique(athlete_idx[offsets[a]:offsets[b]])
+        _write_replayed(store, members, ratings, last_raced, stamps, offsets, range(a, b))
+        if profiler is not None:
+            profiler.add("set_many", time.perf_counter() - t0)
+    if checkpoints is not None:
+        checkpoints.save(n_races, store.checkpoint_state())
+    if profiler is not None:
+        profiler.add_wall(time.perf_counter() - wall_start)
+        profiler.emit()
+
+
+# --------------------------------------------
+# Checkpoints: resume and partial re-rating
+# --------------------------------------------
+
+_CKPT_NAME = re.compile(r"ckpt-(\d+)\.npy")
+
+
+class RatingCheckpoints:
+    """
+    Copies of the store's ratings taken by backfill_packed before every
+    `every`-th race (and after the last one), keyed by race position.
+    With a directory they are written as ckpt-<race>.npy files, so a crashed
+    backfill can be resumed and a later re-rate can find them again.
+    """
+    def __init__(self, every: int = 500, directory: Union[str, Path, None] = None):
+        self.every = max(int(every), 1)
+        self.directory = Path(directory) if directory is not None else None
+        self._mem: Dict[int, np.ndarray] = {}
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, race: int) -> Path:
+        return self.directory / f"ckpt-{race:08d}.npy"
+
+    @property
+    def races(self) -> List[int]:
+        if self.directory is None:
+            return sorted(self._mem)
+        names = (p.name for p in self.directory.glob("ckpt-*.npy"))
+        return sorted(int(m.group(1)) for m in map(_CKPT_NAME.fullmatch, names) if m)
+
+    def save(self, race: int, ratings: np.ndarray) -> None:
+        """Record the store state (EloStore.checkpoint_state) as it stands BEFORE race `race`."""
+        if self.directory is None:
+            self._mem[race] = np.array(ratings, dtype=np.float64)  # copy
+            return
+        # Written under a name outside the ckpt-*.npy pattern, then renamed into place
+        tmp = self.directory / f".ckpt-{race:08d}.npy.tmp"
+        with tmp.open("wb") as handle:
+            np.save(handle, np.asarray(ratings, dtype=np.float64))
+        tmp.replace(self._path(race))
+
+    def load(self, race: int) -> np.ndarray:
+        if self.directory is None:
+            return self._mem[race]
+        return np.load(self._path(race), mmap_mode="r")
+
+    def nearest(self, race: int) -> Optional[int]:
+        """Latest checkpoint at or before `race`, or None."""
+        earlier = [k for k in self.races if k <= race]
+        return earlier[-1] if earlier else None
+
+    def discard_after(self, race: int) -> None:
+        """Drop checkpoints past `race` (they no longer match the history)."""
+        for k in self.races:
+            if k > race:
+                if self.directory is None:
+                    del self._mem[k]
+                else:
+                    self._path(k).unlink()
+
+
+def splice_race(
+    packed: PackedRaces,
+    race: int,
+    athlete_idx: np.ndarray,
+    finish_positions: np.ndarray,
+    insert: bool = False
+) -> PackedRaces:
+    """
+    Copy of `packed` with race `race` replaced (corrected result) or, with
+    insert=True, a new race inserted at that position (late historical race).
+    athlete_idx are store indices, finish_positions 0-based.
+    """
+    lo = packed.offsets[race]
+    hi = lo if insert else packed.offsets[race + 1]
+    athlete_idx = np.asarray(athlete_idx, dtype=packed.athlete_idx.dtype)
+    finish_positions = np.asarray(finish_positions, dtype=packed.finish_positions.dtype)
+    if athlete_idx.size != finish_positions.size:
+        raise ValueError("athlete_idx and finish_positions must be same length")
+
+    sizes = np.diff(packed.offsets)
+    if insert:
+        sizes = np.insert(sizes, race, athlete_idx.size)
+    else:
+        sizes[race] = athlete_idx.size
+    offsets = np.zeros(sizes.size + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    return PackedRaces(
+        np.concatenate((packed.athlete_idx[:lo], athlete_idx, packed.athlete_idx[hi:])),
+        np.concatenate((packed.finish_positions[:lo], finish_positions, packed.finish_positions[hi:])),
+        offsets,
+    )
+
+
+def resume_backfill(
+    store: EloStore,
+    packed: PackedRaces,
+    checkpoints: RatingCheckpoints,
+    **params: Any
+) -> int:
+    """
+    Continue a packed backfill from its latest checkpoint, e.g. after a
+    crash. Checkpoints are index-aligned, so the store must intern athletes
+    in the same order as the checkpointed run (re-packing the same races into
+    a fresh store does). Returns the race position it resumed from.
+    """
+    start = checkpoints.nearest(packed.n_races)
+    if start is None:
+        start = 0
+    else:
+        store.restore_ratings(checkpoints.load(start))
+    backfill_packed(store, packed, checkpoints=checkpoints, start=start, **params)
+    return start
+
+
+def rerate_from(
+    store: EloStore,
+    packed: PackedRaces,
+    race: int,
+    checkpoints: RatingCheckpoints,
+    **params: Any
+) -> int:
+    """
+    Re-rate after race `race` changed (see splice_race): restore the nearest
+    checkpoint at or before it and replay only the suffix. Checkpoints past
+    it are discarded and rewritten by the replay. Returns the race position
+    the replay started from.
+    """
+    start = checkpoints.nearest(race)
+    if start is None:
+        raise ValueError(f"No checkpoint at or before race {race}")
+    checkpoints.discard_after(start)
+    store.restore_ratings(checkpoints.load(start))
+    backfill_packed(store, packed, checkpoints=checkpoints, start=start, **params)
+    return start
+
+
+# --------------------------------------------
+# Multi-pool ratings (distance / gender / discipline)
+# --------------------------------------------
+
+DEFAULT_POOLS = ("overall", "sprint", "olympic", "half", "full", "male", "female", "swim", "bike", "run")
+DISCIPLINES = ("swim", "bike", "run")
+
+POOL_SUMMARY_DTYPE = np.dtype([
+    ("pool", np.int16),
+    ("athlete", np.int64),
+    ("finish_place", np.int32),
+    ("old", np.float64),
+    ("new", np.float64),
+    ("delta", np.float64),
+])
+
+
+def _gender_pool(value: Any) -> Optional[str]:
+    """'M', 'male', 'M30-34' -> 'male'; 'F', 'W', 'female', 'F40-44' -> 'female'."""
+    text = str(value or "").strip().lower()
+    if text.startswith("m"):
+        return "male"
+    if text.startswith(("f", "w")):
+        return "female"
+    return None
+
+
+class PoolEloStore(EloStore):
+    """
+    EloStore holding one rating per (athlete, pool): "overall" plus, by
+    default, per-distance, per-gender and per-discipline pools.
+
+    Ratings are a pool-major matrix (_matrix[pool, athlete]); row 0 is the
+    overall pool and doubles as the base class's _elos, so every single-pool
+    API (get_many, update_from_race_results, backfills, checkpoints) keeps
+    working on overall ratings. update_pools_from_race updates all pools a
+    race touches in one pass. Decay, when enabled, applies to the overall
+    pool only.
+    """
+    def __init__(
+        self,
+        pools: Iterable[str] = DEFAULT_POOLS,
+        base_elo: float = 1400.0,
+        capacity: int = 1024,
+        decay_half_life: Optional[float] = None,
+        decay_target: Optional[float] = None
+    ):
+        pools = list(pools)
+        if not pools or pools[0] != "overall":
+            pools = ["overall"] + [p for p in pools if p != "overall"]
+        self.pools: List[str] = pools
+        self._pool_index = {p: k for k, p in enumerate(pools)}
+        super().__init__(base_elo=base_elo, capacity=capacity, decay_half_life=decay_half_life, decay_target=decay_target)
+        self._matrix = np.full((len(pools), self._elos.size), self.base_elo, dtype=np.float64)
+        self._elos = self._matrix[0]
+
+    def pool_id(self, pool: str) -> int:
+        return self._pool_index[pool]
+
+    @property
+    def pool_ratings(self) -> np.ndarray:
+        """(athlete x pool) view of all interned athletes."""
+        return self._matrix[:, :len(self)].T
+
+    def _resize(self, cap: int) -> None:
+        matrix = getattr(self, "_matrix", None)
+        super()._resize(cap)
+        if matrix is None:
+            return
+        grown = np.full((matrix.shape[0], cap), self.base_elo, dtype=np.float64)
+        grown[:, :matrix.shape[1]] = matrix
+        self._matrix = grown
+        self._elos = grown[0]
+
+    def get_pool_idx(self, pools: np.ndarray, idx: np.ndarray) -> np.ndarray:
+        return self._matrix[pools, idx]
+
+    def set_pool_idx(self, pools: np.ndarray, idx: np.ndarray, new_elos: np.ndarray) -> None:
+        self._matrix[pools, idx] = new_elos
+        if self._ranking is not None:
+            self._ranking.mark(idx)  # only overall-pool changes move a rank
+
+    def to_dataframe(self, pool: str = "overall") -> pd.DataFrame:
+        ratings = self._matrix[self.pool_id(pool), :len(self)].copy()
+        return pd.DataFrame({"Athlete": list(self.athlete_ids), "ELO": ratings}).sort_values("ELO", ascending=False)
+
+    def _save_snapshot_extras(self, directory: Path) -> Dict[str, Any]:
+        np.save(directory / "pool_ratings.npy", self._matrix)
+        return {"pools": self.pools}
+
+    def _load_snapshot_extras(self, directory: Path, meta: Dict[str, Any], mmap: bool) -> None:
+        self.pools = list(meta["pools"])
+        self._pool_index = {p: k for k, p in enumerate(self.pools)}
+        self._matrix = np.load(directory / "pool_ratings.npy", mmap_mode="c" if mmap else None)
+        self._elos = self._matrix[0]
+
+
+def update_pools_from_race(
+    store: PoolEloStore,
+    athlete_ids: List[str],
+    finish_places: List[int],
+    *,
+    distance: Optional[str] = None,
+    genders: Optional[List[Any]] = None,
+    splits: Optional[Dict[str, Any]] = None,
+    race_date: Any = None,
+    Klocal: float = 4.5,
+    Kglobal: float = 1.0,
+    alpha: float = 0.2,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    fast_math: bool = False
+) -> np.ndarray:
+    """
+    Incremental update for ONE race across every pool it applies to:
+      - "overall", and the race's distance pool (distanceKey) if the store has it
+      - one pool per gender (genders[i] like "M", "female", "F30-34"),
+        ranked by finish place among that gender's finishers
+      - "swim" / "bike" / "run", ranked by splits[discipline][i] in seconds
+        (NaN / None = no valid split, athlete left out of that pool)
+    All pool sub-races are rated together by apply_segmented_update.
+    race_date: as for update_from_race_results; overall ratings are decayed
+    to it and it is recorded as the athletes' last-raced time.
+    Returns a POOL_SUMMARY_DTYPE array (finish_place is within the pool).
+    """
+    n = len(athlete_ids)
+    if len(finish_places) != n:
+        raise ValueError("athlete_ids and finish_places must be same length")
+    if n == 0:
+        return np.empty(0, dtype=POOL_SUMMARY_DTYPE)
+
+    idx = store.intern(athlete_ids)
+    finish_positions = np.asarray(finish_places, dtype=np.int32) - 1
+    everyone = np.arange(n, dtype=np.int64)
+
+    # (pool id, members as positions in this race, 0-based places within the pool)
+    segments: List[Tuple[int, np.ndarray, np.ndarray]] = [(0, everyone, finish_positions)]
+
+    def ranked(members: np.ndarray, key: np.ndarray) -> np.ndarray:
+        places = np.empty(members.size, dtype=np.int32)
+        places[np.argsort(key[members], kind="mergesort")] = np.arange(members.size, dtype=np.int32)
+        return places
+
+    if distance is not None and distance != "overall" and distance in store._pool_index:
+        segments.append((store.pool_id(distance), everyone, finish_positions))
+    if genders is not None:
+        labels = np.array([_gender_pool(g) for g in genders], dtype=object)
+        for pool in ("male", "female"):
+            if pool in store._pool_index:
+                members = np.flatnonzero(labels == pool)
+                if members.size:
+                    segments.append((store.pool_id(pool), members, ranked(members, finish_positions)))
+    for discipline, times in (splits or {}).items():
+        if discipline not in store._pool_index:
+            continue
+        times = np.array([np.nan if t is None else t for t in times], dtype=np.float64)
+        members = np.flatnonzero(np.isfinite(times))
+        if members.size:
+            segments.append((store.pool_id(discipline), members, ranked(members, times)))
+
+    sizes = [members.size for _, members, _ in segments]
+    seg_offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=seg_offsets[1:])
+    pools = np.repeat(np.array([p for p, _, _ in segments], dtype=np.int64), sizes)
+    athletes = idx[np.concatenate([members for _, members, _ in segments])]
+    positions = np.concatenate([places for _, _, places in segments])
+
+    at = None if race_date is None else _to_timestamp(race_date)
+    old_elos = store.get_pool_idx(pools, athletes)
+    old_elos[:n] = store.get_many_idx(idx, at=at)  # segment 0 is the overall pool
+    new_elos, delta = apply_segmented_update(
+        old_elos, positions, seg_offsets,
+        Klocal=Klocal, Kglobal=Kglobal, alpha=alpha, window=window, max_change=max_change, fast_math=fast_math,
+    )
+    store.set_pool_idx(pools[n:], athletes[n:], new_elos[n:])
+    store.set_many_idx(idx, new_elos[:n], at=at)
+
+    out = np.empty(athletes.size, dtype=POOL_SUMMARY_DTYPE)
+    out["pool"] = pools
+    out["athlete"] = athletes
+    out["finish_place"] = positions + 1
+    out["old"] = old_elos
+    out["new"] = new_elos
+    out["delta"] = delta
+    return out
+
+
+def backfill_all_pools(
+    store: PoolEloStore,
+    races: Iterable[Dict[str, Any]],
+    **params: Any
+) -> None:
+    """
+    Chronological multi-pool backfill. Race dicts are as for
+    backfill_all_races (including the optional "date") plus optional
+    "distance", "genders" and "splits" (see update_pools_from_race).
     """
     for race in races:
-        update_from_race_results(
+        update_pools_from_race(
             store,
-            athlete_ids=race["athlete_ids"],
-            finish_places=race["finish_places"],
-            Klocal=Klocal,
-            Kglobal=Kglobal,
-            alpha=alpha,
-            window=window,
-            max_change=max_change
+            race["athlete_ids"],
+            race["finish_places"],
+            distance=race.get("distance"),
+            genders=race.get("genders"),
+            splits=race.get("splits"),
+            race_date=race.get("date"),
+            **params
+        )
+
+
+# --------------------------------------------
+# Parallel (wave-scheduled) backfill
+# --------------------------------------------
+
+def schedule_waves(packed: PackedRaces, n_athletes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group chronologically ordered races into waves of races that share no
+    athletes. A race lands in the wave after the latest wave of any of its
+    athletes, so every athlete still sees their races in the original order.
+    Returns (race_order, wave_offsets) in CSR layout: wave w is
+    race_order[wave_offsets[w]:wave_offsets[w + 1]], races ascending.
+    """
+    athlete_idx, _, offsets = packed
+    n_races = offsets.size - 1
+    last_wave = np.full(max(int(n_athletes), 1), -1, dtype=np.int64)
+    wave = np.zeros(n_races, dtype=np.int64)
+    for r in range(n_races):
+        idx = athlete_idx[offsets[r]:offsets[r + 1]]
+        if idx.size == 0:
+            continue
+        w = last_wave[idx].max() + 1
+        wave[r] = w
+        last_wave[idx] = w
+
+    race_order = np.argsort(wave, kind="mergesort")
+    counts = np.bincount(wave, minlength=1) if n_races else np.zeros(0, dtype=np.int64)
+    wave_offsets = np.zeros(counts.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=wave_offsets[1:])
+    return race_order, wave_offsets
+
+
+# Per-process views onto the shared arrays, set by _wave_worker_init
+_WAVE_STATE: Dict[str, Any] = {}
+
+
+def _attach_shared(name: str, shape: Tuple[int, ...], dtype: Any) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _wave_worker_init(
+    specs: Dict[str, Tuple[str, Tuple[int, ...], str]],
+    params: Dict[str, Any],
+    decay: Optional[Tuple[float, float]]
+) -> None:
+    for key, (name, shape, dtype) in specs.items():
+        _WAVE_STATE[key] = _attach_shared(name, shape, dtype)
+    _WAVE_STATE["params"] = params
+    _WAVE_STATE["decay"] = decay
+
+
+def _wave_worker_run(race_ids: np.ndarray) -> None:
+    dated = "stamps" in _WAVE_STATE
+    _run_races(
+        _WAVE_STATE["ratings"][1],
+        _WAVE_STATE["athlete_idx"][1],
+        _WAVE_STATE["finish_positions"][1],
+        _WAVE_STATE["offsets"][1],
+        race_ids,
+        _WAVE_STATE["params"],
+        _WAVE_STATE["stamps"][1] if dated else None,
+        _WAVE_STATE["last_raced"][1] if dated else None,
+        _WAVE_STATE["decay"],
+    )
+
+
+def backfill_parallel(
+    store: EloStore,
+    packed: PackedRaces,
+    *,
+    processes: Optional[int] = None,
+    min_parallel_results: int = 20000,
+    Klocal: float = 4.5,
+    Kglobal: float = 1.0,
+    alpha: float = 0.2,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    race_dates: Optional[List[Any]] = None,
+    fast_math: bool = False
+) -> None:
+    """
+    Parallel backfill over a packed history. Races are grouped into
+    non-conflicting waves (schedule_waves); each wave is split across a
+    process pool that updates a shared-memory ratings array in place.
+    Waves with fewer than min_parallel_results results run in this
+    process, since pool dispatch would cost more than the math.
+    race_dates: per-race dates, for decay and last-raced tracking as in
+    backfill_packed (each athlete still sees their races in order).
+    Ratings, last-raced times and the clock are identical to backfill_packed.
+    """
+    params = dict(Klocal=Klocal, Kglobal=Kglobal, alpha=alpha, window=window, max_change=max_change, fast_math=fast_math)
+    n = len(store)
+    ctx = get_context()
+    processes = processes or ctx.cpu_count()
+    if processes <= 1 or packed.n_races == 0:
+        backfill_packed(store, packed, race_dates=race_dates, **params)
+        return
+
+    race_order, wave_offsets = schedule_waves(packed, n)
+    sizes = np.diff(packed.offsets)
+
+    # Read through the store, not its cached array: a MongoEloStore only
+    # holds fetched athletes (and their versions / last-raced times)
+    used = np.unique(packed.athlete_idx)
+    ratings, last_raced = _read_for_replay(store, used)
+
+    arrays = {
+        "ratings": ratings,
+        "athlete_idx": packed.athlete_idx,
+        "finish_positions": packed.finish_positions,
+        "offsets": packed.offsets,
+    }
+    stamps = None
+    decay = None
+    if race_dates is not None:
+        stamps = arrays["stamps"] = _race_stamps(race_dates)
+        arrays["last_raced"] = last_raced
+        if store.decay_half_life is not None:
+            decay = (store.decay_half_life, store.decay_target)
+    segments: Dict[str, shared_memory.SharedMemory] = {}
+    views: Dict[str, np.ndarray] = {}
+    specs: Dict[str, Tuple[str, Tuple[int, ...], str]] = {}
+    try:
+        for key, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            segments[key] = shm
+            views[key] = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+            views[key][...] = arr
+            specs[key] = (shm.name, arr.shape, arr.dtype.str)
+
+        with ctx.Pool(processes, initializer=_wave_worker_init, initargs=(specs, params, decay)) as pool:
+            for w in range(wave_offsets.size - 1):
+                race_ids = race_order[wave_offsets[w]:wave_offsets[w + 1]]
+                if race_ids.size < 2 or sizes[race_ids].sum() < min_parallel_results:
+                    _run_races(
+                        views["ratings"], views["athlete_idx"], views["finish_positions"],
+                        views["offsets"], race_ids, params,
+                        views.get("stamps"), views.get("last_raced"), decay
+                    )
+                    continue
+                chunks = [c for c in np.array_split(race_ids, min(processes, race_ids.size)) if c.size]
+                pool.map(_wave_worker_run, chunks)
+
+        # Only athletes in the history changed; writing the rest would bump their versions
+        _write_replayed(
+            store, used, views["ratings"], views.get("last_raced"), stamps, packed.offsets, range(packed.n_races)
         )
+    finally:
+        views.clear()
+        for shm in segments.values():
+            shm.close()
+            shm.unlink()
 
 
 # --------------------------------------------
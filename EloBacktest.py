@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Predictive-accuracy backtest for the Elo engine in Elo.py.
+
+Replays a real race history in date order and, before every race, scores
+the pre-race ratings against the result:
+  - log_loss: pairwise log-loss of the Elo win probability
+  - kendall_tau: rank agreement between rating order and finish order,
+    averaged over races (pairs tied on rating or place count as neither)
+  - accuracy: share of pairs where the higher-rated athlete finished ahead
+
+Which pairs get scored depends only on the history, so it is decided once
+by prepare_backtest: fields with more than max_pairs pairs are sampled
+(seeded per race), and pairs where either athlete has fewer than min_prior
+earlier races are dropped, since a first-time rating says nothing. Every
+candidate is scored on exactly the same pairs.
+
+backtest_candidates replays many parameter sets across a process pool. The
+race arrays and pair lists live in multiprocessing.shared_memory, so workers
+attach to one copy instead of each receiving a pickled history.
+
+Usage examples (from repo root):
+  python EloBacktest.py --mongo-uri "$MONGODB_URI" --db data
+  python EloBacktest.py --klocal 3.5 4.5 5.5 --alpha 0.1 0.2 0.3 --window 2 3 5 --processes 8
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from multiprocessing import get_context, shared_memory
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from Elo import EloStore, PackedRaces, _attach_shared, _expected_win_prob, _run_races
+
+try:
+    import certifi
+except ImportError:  # pragma: no cover
+    certifi = None
+
+LOG_EPS = 1e-12
+
+
+class BacktestData(NamedTuple):
+    """
+    A packed history plus the pairs to score, as flat entry indices into the
+    packed arrays: pair k compares entries pair_a[k] and pair_b[k] of race
+    pair_race[k].
+    """
+    packed: PackedRaces
+    n_athletes: int
+    pair_a: np.ndarray
+    pair_b: np.ndarray
+    pair_race: np.ndarray
+
+
+def concat_packed(parts: Iterable[PackedRaces]) -> PackedRaces:
+    """Join consecutive PackedRaces (e.g. streamed RaceBatch.packed) into one."""
+    idx_chunks: List[np.ndarray] = []
+    pos_chunks: List[np.ndarray] = []
+    off_chunks: List[np.ndarray] = [np.zeros(1, dtype=np.int64)]
+    base = 0
+    for part in parts:
+        idx_chunks.append(part.athlete_idx)
+        pos_chunks.append(part.finish_positions)
+        off_chunks.append(part.offsets[1:] + base)
+        base += part.n_results
+    if not idx_chunks:
+        return PackedRaces(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), off_chunks[0])
+    return PackedRaces(
+        np.concatenate(idx_chunks).astype(np.int64, copy=False),
+        np.concatenate(pos_chunks).astype(np.int32, copy=False),
+        np.concatenate(off_chunks),
+    )
+
+
+def prepare_backtest(
+    packed: PackedRaces,
+    n_athletes: int,
+    *,
+    max_pairs: int = 500,
+    min_prior: int = 1,
+    seed: int = 0
+) -> BacktestData:
+    """
+    Choose the scored pairs for every race: all pairs when a field has at
+    most max_pairs of them, otherwise max_pairs pairs drawn with a per-race
+    seed. Pairs tied on place, or with an athlete who has raced fewer than
+    min_prior times before, are dropped.
+    """
+    athlete_idx, finish_positions, offsets = packed
+    prior = np.zeros(max(int(n_athletes), 1), dtype=np.int64)
+    a_chunks: List[np.ndarray] = []
+    b_chunks: List[np.ndarray] = []
+    r_chunks: List[np.ndarray] = []
+    for r in range(packed.n_races):
+        lo, hi = int(offsets[r]), int(offsets[r + 1])
+        n = hi - lo
+        if n < 2:
+            prior[athlete_idx[lo:hi]] += 1
+            continue
+        if n * (n - 1) // 2 <= max_pairs:
+            a, b = np.triu_indices(n, k=1)
+        else:
+            rng = np.random.default_rng([seed, r])
+            a = rng.integers(0, n, size=max_pairs)
+            b = rng.integers(0, n - 1, size=max_pairs)
+            b += b >= a
+        idx = athlete_idx[lo:hi]
+        pos = finish_positions[lo:hi]
+        keep = (pos[a] != pos[b]) & (prior[idx[a]] >= min_prior) & (prior[idx[b]] >= min_prior)
+        if keep.any():
+            a_chunks.append(a[keep] + lo)
+            b_chunks.append(b[keep] + lo)
+            r_chunks.append(np.full(int(keep.sum()), r, dtype=np.int64))
+        prior[idx] += 1
+
+    def flat(chunks: List[np.ndarray]) -> np.ndarray:
+        return np.concatenate(chunks).astype(np.int64, copy=False) if chunks else np.empty(0, dtype=np.int64)
+
+    return BacktestData(packed, int(n_athletes), flat(a_chunks), flat(b_chunks), flat(r_chunks))
+
+
+def replay_pre_ratings(
+    packed: PackedRaces,
+    n_athletes: int,
+    *,
+    base_elo: float = 1400.0,
+    Klocal: float = 4.5,
+    Kglobal: float = 1.0,
+    alpha: float = 0.2,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    fast_math: bool = False
+) -> np.ndarray:
+    """
+    Replay the history from base_elo and return every entry's rating going
+    into its race (aligned with packed.athlete_idx). Same ratings as
+    backfill_packed on a fresh EloStore.
+    """
+    ratings = np.full(max(int(n_athletes), 1), base_elo, dtype=np.float64)
+    pre = np.empty(packed.athlete_idx.size, dtype=np.float64)
+    params = dict(Klocal=Klocal, Kglobal=Kglobal, alpha=alpha, window=window, max_change=max_change, fast_math=fast_math)
+    _run_races(ratings, *packed, range(packed.n_races), params, pre=pre)
+    return pre
+
+
+def score_pairs(
+    pre: np.ndarray,
+    finish_positions: np.ndarray,
+    pair_a: np.ndarray,
+    pair_b: np.ndarray,
+    pair_race: np.ndarray
+) -> Dict[str, float]:
+    """Pairwise log-loss, accuracy and race-averaged Kendall tau of pre-race ratings."""
+    if pair_a.size == 0:
+        return {"log_loss": float("nan"), "accuracy": float("nan"), "kendall_tau": float("nan"), "pairs": 0, "races": 0}
+    a_won = finish_positions[pair_a] < finish_positions[pair_b]
+    gap = pre[pair_a] - pre[pair_b]
+    p_a = np.clip(_expected_win_prob(-gap), LOG_EPS, 1.0 - LOG_EPS)
+    log_loss = -np.where(a_won, np.log(p_a), np.log1p(-p_a)).mean()
+
+    # +1 concordant, -1 discordant, 0 tied on rating
+    agree = np.sign(gap) * np.where(a_won, 1.0, -1.0)
+    races, race_of_pair = np.unique(pair_race, return_inverse=True)
+    per_race = np.bincount(race_of_pair, weights=agree) / np.bincount(race_of_pair)
+    return {
+        "log_loss": float(log_loss),
+        "accuracy": float((agree > 0).mean()),
+        "kendall_tau": float(per_race.mean()),
+        "pairs": int(pair_a.size),
+        "races": int(races.size),
+    }
+
+
+def backtest(data: BacktestData, *, base_elo: float = 1400.0, **params: Any) -> Dict[str, float]:
+    """Replay with one parameter set (Klocal, Kglobal, alpha, window, max_change, fast_math) and score it."""
+    pre = replay_pre_ratings(data.packed, data.n_athletes, base_elo=base_elo, **params)
+    return score_pairs(pre, data.packed.finish_positions, data.pair_a, data.pair_b, data.pair_race)
+
+
+# --------------------------------------------
+# Many candidates over one shared history
+# --------------------------------------------
+
+# Per-process views onto the shared arrays, set by _backtest_worker_init
+_BACKTEST_STATE: Dict[str, Any] = {}
+
+_SHARED_FIELDS = ("athlete_idx", "finish_positions", "offsets", "pair_a", "pair_b", "pair_race")
+
+
+def _backtest_arrays(data: BacktestData) -> Dict[str, np.ndarray]:
+    return {
+        "athlete_idx": data.packed.athlete_idx,
+        "finish_positions": data.packed.finish_positions,
+        "offsets": data.packed.offsets,
+        "pair_a": data.pair_a,
+        "pair_b": data.pair_b,
+        "pair_race": data.pair_race,
+    }
+
+
+def _backtest_worker_init(specs: Dict[str, Tuple[str, Tuple[int, ...], str]], n_athletes: int, base_elo: float) -> None:
+    views = {}
+    for key, (name, shape, dtype) in specs.items():
+        _BACKTEST_STATE[key] = _attach_shared(name, shape, dtype)
+        views[key] = _BACKTEST_STATE[key][1]
+    packed = PackedRaces(views["athlete_idx"], views["finish_positions"], views["offsets"])
+    _BACKTEST_STATE["data"] = BacktestData(packed, n_athletes, views["pair_a"], views["pair_b"], views["pair_race"])
+    _BACKTEST_STATE["base_elo"] = base_elo
+
+
+def _backtest_worker_run(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {**params, **backtest(_BACKTEST_STATE["data"], base_elo=_BACKTEST_STATE["base_elo"], **params)}
+
+
+def backtest_candidates(
+    data: BacktestData,
+    candidates: List[Dict[str, Any]],
+    *,
+    base_elo: float = 1400.0,
+    processes: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Score every parameter set in `candidates`; one row per candidate, in
+    input order. With processes > 1 the history is copied once into shared
+    memory and each worker replays candidates against it.
+    """
+    ctx = get_context()
+    processes = min(processes or ctx.cpu_count(), len(candidates))
+    if processes <= 1:
+        return pd.DataFrame([{**c, **backtest(data, base_elo=base_elo, **c)} for c in candidates])
+
+    segments: Dict[str, shared_memory.SharedMemory] = {}
+    specs: Dict[str, Tuple[str, Tuple[int, ...], str]] = {}
+    try:
+        for key, arr in _backtest_arrays(data).items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            segments[key] = shm
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            specs[key] = (shm.name, arr.shape, arr.dtype.str)
+
+        with ctx.Pool(processes, initializer=_backtest_worker_init, initargs=(specs, data.n_athletes, base_elo)) as pool:
+            rows = pool.map(_backtest_worker_run, candidates, chunksize=1)
+    finally:
+        for shm in segments.values():
+            shm.close()
+            shm.unlink()
+    return pd.DataFrame(rows)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backtest Elo parameter sets against real race history.")
+    parser.add_argument(
+        "--mongo-uri",
+        default=os.getenv("MONGODB_URI"),
+        help="Mongo connection string (defaults to env MONGODB_URI).",
+    )
+    parser.add_argument(
+        "--db",
+        default=os.getenv("MONGODB_DATA_DB", "data"),
+        help="Mongo database name (defaults to env MONGODB_DATA_DB or 'data').",
+    )
+    parser.add_argument("--races-collection", default="races", help="Races collection name.")
+    parser.add_argument(
+        "--tls-ca-file",
+        default=None,
+        help="Path to a CA bundle for TLS (defaults to certifi bundle when available).",
+    )
+    parser.add_argument("--klocal", type=float, nargs="+", default=[4.5], help="Klocal candidates.")
+    parser.add_argument("--kglobal", type=float, nargs="+", default=[1.0], help="Kglobal candidates.")
+    parser.add_argument("--alpha", type=float, nargs="+", default=[0.2], help="alpha candidates.")
+    parser.add_argument("--window", type=int, nargs="+", default=[3], help="window candidates.")
+    parser.add_argument("--max-change", type=float, nargs="+", default=[20.0], help="max_change candidates.")
+    parser.add_argument("--base-elo", type=float, default=1500.0, help="Starting rating (default: 1500).")
+    parser.add_argument("--max-pairs", type=int, default=500, help="Scored pairs per race before sampling (default: 500).")
+    parser.add_argument("--min-prior", type=int, default=1, help="Earlier races both athletes need to be scored (default: 1).")
+    parser.add_argument("--seed", type=int, default=0, help="Pair sampling seed.")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: CPU count).")
+    args = parser.parse_args()
+
+    try:
+        from pymongo import MongoClient
+    except ImportError:
+        print("Missing dependency: pymongo. Install with `python3 -m pip install pymongo`.", file=sys.stderr)
+        return 1
+    if not args.mongo_uri:
+        print("Missing Mongo URI. Pass --mongo-uri or set MONGODB_URI.", file=sys.stderr)
+        return 1
+
+    from EloMongo import iter_race_batches
+
+    tls_ca_file = args.tls_ca_file or (certifi.where() if certifi else None)
+    client = MongoClient(args.mongo_uri, tlsCAFile=tls_ca_file)
+    store = EloStore(base_elo=args.base_elo)
+    packed = concat_packed(batch.packed for batch in iter_race_batches(client[args.db][args.races_collection], store))
+    data = prepare_backtest(packed, len(store), max_pairs=args.max_pairs, min_prior=args.min_prior, seed=args.seed)
+    print(f"{packed.n_races} races, {len(store)} athletes, {data.pair_a.size} scored pairs")
+
+    candidates = [
+        dict(Klocal=k, Kglobal=g, alpha=a, window=w, max_change=m)
+        for k, g, a, w, m in itertools.product(args.klocal, args.kglobal, args.alpha, args.window, args.max_change)
+    ]
+    start = time.perf_counter()
+    table = backtest_candidates(data, candidates, base_elo=args.base_elo, processes=args.processes)
+    print(f"{len(candidates)} candidates in {time.perf_counter() - start:.1f}s")
+    print(table.sort_values("log_loss", kind="mergesort").to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the Elo engine in Elo.py.
+
+Generates synthetic race histories (athletes with a latent skill, finish order
+from skill + noise) and times the engine entry points across field sizes and
+window sizes:
+  local_updates_for_race, bulk_updates_for_race, apply_race_update,
+  update_from_race_results, backfill_all_races, backfill_packed
+
+Results are written as JSON; pass --baseline to compare against an earlier
+run and exit non-zero when any case is slower than the tolerance allows.
+
+Kernel runs also time fast_math=True and check it against exact mode: the
+largest per-race rating difference must stay within
+Elo.fast_math_error_bound, otherwise the run fails as well.
+
+Usage examples (from repo root):
+  python EloBenchmark.py                       # quick profile, prints JSON
+  python EloBenchmark.py --profile full --out bench.json
+  python EloBenchmark.py --baseline bench.json --tolerance 0.25
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+import Elo
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "quick": {
+        "field_sizes": [20, 200, 2000],
+        "windows": [1, 3, 10],
+        "pools": [10_000],
+        "n_races": 500,
+        "repeat": 5,
+    },
+    "full": {
+        "field_sizes": [20, 100, 500, 1000, 3000],
+        "windows": [1, 3, 5, 10, 25],
+        "pools": [10_000, 100_000, 1_000_000],
+        "n_races": 5000,
+        "repeat": 7,
+    },
+}
+
+
+# --------------------------------------------
+# Synthetic data
+# --------------------------------------------
+
+def synthetic_field(rng: np.random.Generator, n: int, skill_sd: float = 80.0, noise_sd: float = 40.0):
+    """One race: (ratings, 0-based finish positions) with finish order driven by the ratings."""
+    ratings = 1400.0 + rng.normal(0.0, skill_sd, n)
+    performance = ratings + rng.normal(0.0, noise_sd, n)
+    finish_positions = np.empty(n, dtype=np.int32)
+    finish_positions[np.argsort(-performance, kind="mergesort")] = np.arange(n, dtype=np.int32)
+    return ratings, finish_positions
+
+
+def synthetic_history(
+    n_athletes: int,
+    n_races: int,
+    field_min: int = 20,
+    field_max: int = 3000,
+    seed: int = 0,
+    noise_sd: float = 0.8,
+) -> List[Dict[str, Any]]:
+    """
+    Chronological race dicts ({"athlete_ids", "finish_places"}) drawn from a
+    pool of n_athletes with a fixed latent skill each; finish order is skill
+    plus N(0, noise_sd) per race.
+    """
+    rng = np.random.default_rng(seed)
+    skill = rng.normal(0.0, 1.0, n_athletes)
+    field_max = min(field_max, n_athletes)
+    races = []
+    for _ in range(n_races):
+        n = int(rng.integers(min(field_min, field_max), field_max + 1))
+        field = rng.choice(n_athletes, size=n, replace=False)
+        performance = skill[field] + rng.normal(0.0, noise_sd, n)
+        places = np.empty(n, dtype=np.int64)
+        places[np.argsort(-performance, kind="mergesort")] = np.arange(1, n + 1)
+        races.append({
+            "athlete_ids": [f"athlete-{i}" for i in field.tolist()],
+            "finish_places": places.tolist(),
+        })
+    return races
+
+
+# --------------------------------------------
+# Timing
+# --------------------------------------------
+
+def time_case(
+    fn: Callable[[], Any],
+    repeat: int,
+    setup: Optional[Callable[[], Any]] = None,
+    min_sample: float = 0.02,
+) -> Dict[str, float]:
+    """
+    Per-call seconds for fn (min / median / max over `repeat` samples).
+    Without setup, each sample loops fn enough times to take at least
+    min_sample seconds, as timeit's autorange does, so microsecond kernels
+    are not lost in timer noise. With setup (called untimed before every
+    call) each sample is a single call.
+    """
+    number = 1
+    if setup is None:
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= min_sample:
+                break
+            number *= 2
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    samples.sort()
+    return {"min": samples[0], "median": samples[len(samples) // 2], "max": samples[-1], "number": number}
+
+
+def kernel_cases(profile: Dict[str, Any], seed: int) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in profile["field_sizes"]:
+        ratings, finish_positions = synthetic_field(rng, n)
+        order = np.argsort(finish_positions, kind="mergesort")
+
+        for window in profile["windows"]:
+            timing = time_case(lambda: Elo.local_updates_for_race(ratings, order, Klocal=4.5, window=window), profile["repeat"])
+            results.append({"case": "local_updates_for_race", "field": n, "window": window, **timing})
+            timing = time_case(
+                lambda: Elo.apply_race_update(ratings, finish_positions, 4.5, 1.0, 0.2, window=window),
+                profile["repeat"],
+            )
+            results.append({"case": "apply_race_update", "field": n, "window": window, **timing})
+            timing = time_case(
+                lambda: Elo.apply_race_update(ratings, finish_positions, 4.5, 1.0, 0.2, window=window, fast_math=True),
+                profile["repeat"],
+            )
+            results.append({"case": "apply_race_update_fast", "field": n, "window": window, **timing})
+
+        timing = time_case(lambda: Elo.bulk_updates_for_race(ratings, finish_positions, Kglobal=1.0), profile["repeat"])
+        results.append({"case": "bulk_updates_for_race", "field": n, **timing})
+
+        ids = [f"athlete-{i}" for i in range(n)]
+        places = (finish_positions + 1).tolist()
+        store = Elo.EloStore()
+        timing = time_case(lambda: Elo.update_from_race_results(store, ids, places), profile["repeat"])
+        results.append({"case": "update_from_race_results", "field": n, **timing})
+    return results
+
+
+def backfill_cases(profile: Dict[str, Any], seed: int) -> List[Dict[str, Any]]:
+    results = []
+    for pool in profile["pools"]:
+        races = synthetic_history(pool, profile["n_races"], field_min=20, field_max=min(500, pool), seed=seed)
+        n_results = sum(len(r["athlete_ids"]) for r in races)
+        repeat = max(1, profile["repeat"] // 2)
+
+        for window in profile["windows"]:
+            timing = time_case(lambda: Elo.backfill_all_races(Elo.EloStore(), races, window=window), repeat)
+            results.append({
+                "case": "backfill_all_races", "pool": pool, "races": len(races), "results": n_results,
+                "window": window, "results_per_sec": n_results / timing["median"], **timing,
+            })
+
+        holder: Dict[str, Any] = {}
+
+        def setup() -> None:
+            holder["store"] = Elo.EloStore()
+            holder["packed"] = Elo.pack_races(holder["store"], races)
+
+        timing = time_case(lambda: Elo.backfill_packed(holder["store"], holder["packed"]), repeat, setup=setup)
+        results.append({
+            "case": "backfill_packed", "pool": pool, "races": len(races), "results": n_results,
+            "window": 3, "results_per_sec": n_results / timing["median"], **timing,
+        })
+    return results
+
+
+def fast_math_accuracy(profile: Dict[str, Any], seed: int, n_trials: int = 20) -> List[Dict[str, Any]]:
+    """
+    Largest |exact - fast_math| rating after one race, per field size and
+    window, over random fields with a wide rating spread; each row carries
+    the documented bound and whether it held.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n in profile["field_sizes"]:
+        for window in profile["windows"]:
+            worst = 0.0
+            for _ in range(n_trials):
+                ratings, finish_positions = synthetic_field(rng, n, skill_sd=400.0)
+                exact, _ = Elo.apply_race_update(ratings, finish_positions, 4.5, 1.0, 0.2, window=window)
+                fast, _ = Elo.apply_race_update(ratings, finish_positions, 4.5, 1.0, 0.2, window=window, fast_math=True)
+                worst = max(worst, float(np.max(np.abs(exact - fast))))
+            bound = Elo.fast_math_error_bound(4.5, 0.2, window)
+            rows.append({"field": n, "window": window, "max_abs_error": worst, "bound": bound, "ok": worst <= bound})
+    return rows
+
+
+def case_key(row: Dict[str, Any]) -> str:
+    parts = [row["case"]] + [f"{k}={row[k]}" for k in ("field", "pool", "window") if k in row]
+    return " ".join(parts)
+
+
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    tolerance: float,
+    metric: str = "min",
+) -> List[str]:
+    """Cases whose `metric` time regressed by more than `tolerance` (0.25 = 25% slower)."""
+    base = {case_key(row): row for row in baseline}
+    regressions = []
+    for row in results:
+        ref = base.get(case_key(row))
+        if ref is None:
+            continue
+        ratio = row[metric] / ref[metric] if ref[metric] > 0 else 1.0
+        row["vs_baseline"] = ratio
+        if ratio > 1.0 + tolerance:
+            regressions.append(f"{case_key(row)}: {ref[metric]:.6f}s -> {row[metric]:.6f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Elo engine.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick", help="Case grid to run (default: quick).")
+    parser.add_argument("--only", choices=["kernels", "backfill"], default=None, help="Run just one group of cases.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic data.")
+    parser.add_argument("--out", default=None, help="Write JSON results here (default: stdout).")
+    parser.add_argument("--baseline", default=None, help="Earlier JSON results to compare against.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown vs baseline before failing (0.25 = 25%%).",
+    )
+    parser.add_argument(
+        "--metric",
+        choices=["min", "median"],
+        default="min",
+        help="Per-call time compared against the baseline (default: min).",
+    )
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    results: List[Dict[str, Any]] = []
+    accuracy: List[Dict[str, Any]] = []
+    if args.only in (None, "kernels"):
+        results += kernel_cases(profile, args.seed)
+        accuracy = fast_math_accuracy(profile, args.seed)
+    if args.only in (None, "backfill"):
+        results += backfill_cases(profile, args.seed)
+
+    regressions: List[str] = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance, args.metric)
+
+    report = {
+        "profile": args.profile,
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+        "fast_math_accuracy": accuracy,
+        "regressions": regressions,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    else:
+        print(text)
+
+    inaccurate = [row for row in accuracy if not row["ok"]]
+    for row in inaccurate:
+        print(
+            f"FAST_MATH field={row['field']} window={row['window']}: "
+            f"error {row['max_abs_error']:.6f} > bound {row['bound']:.6f}",
+            file=sys.stderr,
+        )
+    if regressions:
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+    if regressions or inaccurate:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
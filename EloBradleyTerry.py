@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Batch (order-independent) rating engine: Bradley-Terry / Plackett-Luce
+strengths fitted to a whole race history at once.
+
+The sequential Elo in Elo.py depends on race order and only compares
+neighbours within `window`. Here every race is reduced to comparisons and
+all of them are fitted jointly, which suits season-end rankings:
+  - Bradley-Terry ("bt"): races become pairwise comparisons (each finisher
+    against the next `window` finishers, or every pair / a seeded sample of
+    max_pairs per race), aggregated into a sparse athlete x athlete matrix
+    stored as an edge list (a < b, games, wins of a).
+  - Plackett-Luce ("pl"): the full finish order of every race, with no
+    pair expansion (memory O(results)).
+Both are fitted with Hunter's MM iterations using numpy bincounts only.
+prior_games adds virtual games (half won) against a reference athlete at
+base_elo, which keeps unbeaten / winless athletes finite and anchors the
+scale: rating = base_elo + 400 * log10(strength).
+
+Comparisons are built race chunk by race chunk and merged into the edge
+list as they go, so memory follows the number of distinct athlete pairs,
+not the number of comparisons. Results go into an EloStore
+(set_many_idx), so ranking(), to_dataframe() and snapshots work unchanged.
+
+Usage examples (from repo root):
+  python EloBradleyTerry.py --mongo-uri "$MONGODB_URI" --db data --top 25
+  python EloBradleyTerry.py --model pl --snapshot snapshots/bt-2024
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from Elo import EloStore, PackedRaces
+
+try:
+    import certifi
+except ImportError:  # pragma: no cover
+    certifi = None
+
+MODELS = ("bt", "pl")
+
+
+class ComparisonMatrix(NamedTuple):
+    """
+    Sparse pairwise results in COO form, one entry per athlete pair that met:
+    a[k] < b[k] (store indices), games[k] comparisons, a_wins[k] won by a.
+    """
+    a: np.ndarray
+    b: np.ndarray
+    games: np.ndarray
+    a_wins: np.ndarray
+    n_athletes: int
+
+    @property
+    def n_comparisons(self) -> int:
+        return int(self.games.sum())
+
+
+class BatchFit(NamedTuple):
+    """ratings aligned with store indices; iterations run; converged within tol."""
+    ratings: np.ndarray
+    iterations: int
+    converged: bool
+    n_comparisons: int
+
+
+# --------------------------------------------
+# Comparisons
+# --------------------------------------------
+
+def _finish_order(packed: PackedRaces) -> Tuple[np.ndarray, np.ndarray]:
+    """Entry order sorted by (race, finish position), and each entry's race."""
+    race = np.repeat(np.arange(packed.n_races, dtype=np.int64), np.diff(packed.offsets))
+    order = np.lexsort((packed.finish_positions, race))
+    return order, race
+
+
+def iter_comparisons(
+    packed: PackedRaces,
+    *,
+    window: Optional[int] = 3,
+    max_pairs: int = 500,
+    seed: int = 0,
+    chunk_races: int = 5000
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield (winner, loser) store-index arrays, chunk_races races at a time.
+    window: each finisher against the next `window` finishers (the band the
+    sequential engine uses). window=None: every pair of a race, or max_pairs
+    pairs drawn with a per-race seed when the field has more. Tied places
+    are skipped.
+    """
+    athlete_idx, finish_positions, offsets = packed
+    order, race = _finish_order(packed)
+    for r0 in range(0, packed.n_races, chunk_races):
+        r1 = min(r0 + chunk_races, packed.n_races)
+        lo, hi = int(offsets[r0]), int(offsets[r1])
+        if window is not None:
+            # order is race-major, so entries lo:hi of it are exactly this chunk
+            ent = order[lo:hi]
+            first_chunks, second_chunks = [], []
+            for d in range(1, window + 1):
+                same = race[ent[:-d]] == race[ent[d:]] if ent.size > d else np.zeros(0, dtype=bool)
+                first_chunks.append(ent[:-d][same])
+                second_chunks.append(ent[d:][same])
+            first = np.concatenate(first_chunks) if first_chunks else np.empty(0, dtype=np.int64)
+            second = np.concatenate(second_chunks) if second_chunks else np.empty(0, dtype=np.int64)
+        else:
+            first_chunks, second_chunks = [], []
+            for r in range(r0, r1):
+                rlo, rhi = int(offsets[r]), int(offsets[r + 1])
+                n = rhi - rlo
+                if n < 2:
+                    continue
+                if n * (n - 1) // 2 <= max_pairs:
+                    i, j = np.triu_indices(n, k=1)
+                else:
+                    rng = np.random.default_rng([seed, r])
+                    i = rng.integers(0, n, size=max_pairs)
+                    j = rng.integers(0, n - 1, size=max_pairs)
+                    j += j >= i
+                first_chunks.append(i + rlo)
+                second_chunks.append(j + rlo)
+            if not first_chunks:
+                continue
+            first = np.concatenate(first_chunks)
+            second = np.concatenate(second_chunks)
+
+        pf, ps = finish_positions[first], finish_positions[second]
+        keep = pf != ps
+        first_won = pf < ps
+        winner = np.where(first_won, athlete_idx[first], athlete_idx[second])[keep]
+        loser = np.where(first_won, athlete_idx[second], athlete_idx[first])[keep]
+        if winner.size:
+            yield winner.astype(np.int64, copy=False), loser.astype(np.int64, copy=False)
+
+
+def build_comparisons(
+    packed: PackedRaces,
+    n_athletes: int,
+    *,
+    window: Optional[int] = 3,
+    max_pairs: int = 500,
+    seed: int = 0,
+    chunk_races: int = 5000
+) -> ComparisonMatrix:
+    """Aggregate iter_comparisons into a ComparisonMatrix, merging chunk by chunk."""
+    n = max(int(n_athletes), 1)
+    keys = np.empty(0, dtype=np.int64)
+    games = np.empty(0, dtype=np.int64)
+    a_wins = np.empty(0, dtype=np.int64)
+    for winner, loser in iter_comparisons(packed, window=window, max_pairs=max_pairs, seed=seed, chunk_races=chunk_races):
+        a = np.minimum(winner, loser)
+        chunk_keys, inverse = np.unique(a * n + np.maximum(winner, loser), return_inverse=True)
+        chunk_games = np.bincount(inverse, minlength=chunk_keys.size)
+        chunk_wins = np.bincount(inverse[winner == a], minlength=chunk_keys.size)
+        # Merge into the sorted edge list: add to pairs seen before, insert new ones
+        at = np.searchsorted(keys, chunk_keys)
+        seen = at < keys.size
+        seen[seen] = keys[at[seen]] == chunk_keys[seen]
+        games[at[seen]] += chunk_games[seen]
+        a_wins[at[seen]] += chunk_wins[seen]
+        fresh = ~seen
+        keys = np.insert(keys, at[fresh], chunk_keys[fresh])
+        games = np.insert(games, at[fresh], chunk_games[fresh])
+        a_wins = np.insert(a_wins, at[fresh], chunk_wins[fresh])
+    return ComparisonMatrix(keys // n, keys % n, games, a_wins, n)
+
+
+# --------------------------------------------
+# Solvers
+# --------------------------------------------
+
+def _to_ratings(log_strength: np.ndarray, base_elo: float) -> np.ndarray:
+    return base_elo + 400.0 * log_strength / np.log(10.0)
+
+
+def _mm_step(wins: np.ndarray, denom: np.ndarray, gamma: np.ndarray, prior_games: float) -> np.ndarray:
+    # MM update with prior_games virtual games (half won) against a strength-1 reference
+    num = wins + 0.5 * prior_games
+    den = denom + prior_games / (gamma + 1.0)
+    new = np.divide(num, den, out=gamma.copy(), where=den > 0)
+    if prior_games <= 0:
+        played = den > 0
+        if played.any():
+            new[played] /= np.exp(np.log(new[played]).mean())
+    return new
+
+
+def fit_bradley_terry(
+    matrix: ComparisonMatrix,
+    *,
+    base_elo: float = 1400.0,
+    prior_games: float = 1.0,
+    max_iter: int = 1000,
+    tol: float = 0.01
+) -> BatchFit:
+    """
+    Bradley-Terry MM fit: gamma_i <- W_i / sum_j n_ij / (gamma_i + gamma_j).
+    Stops when no rating moves more than tol points in an iteration.
+    Athletes without comparisons stay at base_elo.
+    """
+    a, b, games, a_wins, n = matrix
+    gamma = np.ones(n, dtype=np.float64)
+    wins = np.bincount(a, weights=a_wins, minlength=n) + np.bincount(b, weights=games - a_wins, minlength=n)
+    games_f = games.astype(np.float64)
+    tol_log = tol * np.log(10.0) / 400.0
+    converged = False
+    it = 0
+    for it in range(1, max_iter + 1):
+        t = games_f / (gamma[a] + gamma[b])
+        denom = np.bincount(a, weights=t, minlength=n) + np.bincount(b, weights=t, minlength=n)
+        new = _mm_step(wins, denom, gamma, prior_games)
+        step = np.abs(np.log(np.maximum(new, 1e-300)) - np.log(np.maximum(gamma, 1e-300))).max() if n else 0.0
+        gamma = new
+        if step < tol_log:
+            converged = True
+            break
+    log_strength = np.log(np.maximum(gamma, 1e-300))
+    return BatchFit(_to_ratings(log_strength, base_elo), it, converged, matrix.n_comparisons)
+
+
+def fit_plackett_luce(
+    packed: PackedRaces,
+    n_athletes: int,
+    *,
+    base_elo: float = 1400.0,
+    prior_games: float = 1.0,
+    max_iter: int = 1000,
+    tol: float = 0.01
+) -> BatchFit:
+    """
+    Plackett-Luce MM fit over full finish orders (Hunter 2004): each race is
+    a sequence of choices (winner from the field, 2nd from the rest, ...).
+    Vectorized with segmented cumulative sums over the packed arrays; ties
+    are ordered by entry. Same stopping rule as fit_bradley_terry.
+    """
+    n = max(int(n_athletes), 1)
+    order, race = _finish_order(packed)
+    idx = packed.athlete_idx[order]
+    sizes = np.diff(packed.offsets)
+    m = idx.size
+    # Segment start of every entry, in finish order and in reversed order
+    start = packed.offsets[:-1][race]
+    rstart = (m - packed.offsets[1:])[race[::-1]]
+    # Every finisher but the last is chosen once per race they finish in
+    last = np.zeros(m, dtype=bool)
+    last[packed.offsets[1:][sizes > 0] - 1] = True
+    wins = np.bincount(idx[~last], minlength=n).astype(np.float64)
+    n_comparisons = int(np.maximum(sizes - 1, 0).sum())
+
+    def seg_cumsum(x: np.ndarray, seg_start: np.ndarray) -> np.ndarray:
+        c = np.cumsum(x)
+        return c - c[seg_start] + x[seg_start]
+
+    gamma = np.ones(n, dtype=np.float64)
+    tol_log = tol * np.log(10.0) / 400.0
+    converged = False
+    it = 0
+    for it in range(1, max_iter + 1):
+        g = gamma[idx]
+        # Strength still in the field at each place: reverse segmented cumsum
+        remaining = seg_cumsum(g[::-1], rstart)[::-1]
+        inv = np.where(last, 0.0, 1.0 / remaining)
+        # An athlete takes part in every choice up to their own place
+        denom = np.bincount(idx, weights=seg_cumsum(inv, start), minlength=n)
+        new = _mm_step(wins, denom, gamma, prior_games)
+        step = np.abs(np.log(np.maximum(new, 1e-300)) - np.log(np.maximum(gamma, 1e-300))).max()
+        gamma = new
+        if step < tol_log:
+            converged = True
+            break
+    log_strength = np.log(np.maximum(gamma, 1e-300))
+    return BatchFit(_to_ratings(log_strength, base_elo), it, converged, n_comparisons)
+
+
+# --------------------------------------------
+# EloStore output
+# --------------------------------------------
+
+def batch_ratings(
+    store: EloStore,
+    packed: PackedRaces,
+    *,
+    model: str = "bt",
+    window: Optional[int] = 3,
+    max_pairs: int = 500,
+    seed: int = 0,
+    prior_games: float = 1.0,
+    max_iter: int = 1000,
+    tol: float = 0.01
+) -> BatchFit:
+    """
+    Fit `model` ("bt" or "pl") to a packed history built against `store`
+    (pack_races / iter_race_batches) and write every athlete's rating into
+    the store, centred on store.base_elo. window / max_pairs / seed pick the
+    Bradley-Terry comparisons (see iter_comparisons).
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model {model!r}; expected one of {MODELS}")
+    n = len(store)
+    if model == "bt":
+        matrix = build_comparisons(packed, n, window=window, max_pairs=max_pairs, seed=seed)
+        fit = fit_bradley_terry(matrix, base_elo=store.base_elo, prior_games=prior_games, max_iter=max_iter, tol=tol)
+    else:
+        fit = fit_plackett_luce(packed, n, base_elo=store.base_elo, prior_games=prior_games, max_iter=max_iter, tol=tol)
+    store.set_many_idx(np.arange(n), fit.ratings[:n])
+    return fit
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fit batch Bradley-Terry / Plackett-Luce ratings to the full race history.")
+    parser.add_argument(
+        "--mongo-uri",
+        default=os.getenv("MONGODB_URI"),
+        help="Mongo connection string (defaults to env MONGODB_URI).",
+    )
+    parser.add_argument(
+        "--db",
+        default=os.getenv("MONGODB_DATA_DB", "data"),
+        help="Mongo database name (defaults to env MONGODB_DATA_DB or 'data').",
+    )
+    parser.add_argument("--races-collection", default="races", help="Races collection name.")
+    parser.add_argument(
+        "--tls-ca-file",
+        default=None,
+        help="Path to a CA bundle for TLS (defaults to certifi bundle when available).",
+    )
+    parser.add_argument("--model", choices=MODELS, default="bt", help="bt (pairwise) or pl (full finish order).")
+    parser.add_argument("--window", type=int, default=3, help="Bradley-Terry: finishers compared behind each athlete; 0 = all/sampled pairs.")
+    parser.add_argument("--max-pairs", type=int, default=500, help="Bradley-Terry with --window 0: pairs sampled per large race.")
+    parser.add_argument("--prior-games", type=float, default=1.0, help="Virtual games against a base_elo reference (default: 1).")
+    parser.add_argument("--base-elo", type=float, default=1500.0, help="Rating of the reference strength (default: 1500).")
+    parser.add_argument("--max-iter", type=int, default=1000, help="MM iteration cap.")
+    parser.add_argument("--top", type=int, default=20, help="Print the top N athletes.")
+    parser.add_argument("--snapshot", default=None, help="Save the fitted store as a snapshot directory.")
+    args = parser.parse_args()
+
+    try:
+        from pymongo import MongoClient
+    except ImportError:
+        print("Missing dependency: pymongo. Install with `python3 -m pip install pymongo`.", file=sys.stderr)
+        return 1
+    if not args.mongo_uri:
+        print("Missing Mongo URI. Pass --mongo-uri or set MONGODB_URI.", file=sys.stderr)
+        return 1
+
+    from EloBacktest import concat_packed
+    from EloMongo import iter_race_batches
+
+    tls_ca_file = args.tls_ca_file or (certifi.where() if certifi else None)
+    client = MongoClient(args.mongo_uri, tlsCAFile=tls_ca_file)
+    store = EloStore(base_elo=args.base_elo)
+    packed = concat_packed(batch.packed for batch in iter_race_batches(client[args.db][args.races_collection], store))
+
+    start = time.perf_counter()
+    fit = batch_ratings(
+        store, packed,
+        model=args.model, window=args.window or None, max_pairs=args.max_pairs,
+        prior_games=args.prior_games, max_iter=args.max_iter,
+    )
+    print(
+        f"{args.model}: {packed.n_races} races, {len(store)} athletes, {fit.n_comparisons} comparisons; "
+        f"{fit.iterations} iterations ({'converged' if fit.converged else 'not converged'}) in {time.perf_counter() - start:.1f}s"
+    )
+    print(store.ranking().top_k(args.top).to_string(index=False))
+    if args.snapshot:
+        store.save_snapshot(args.snapshot)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+MongoDB-backed persistence for the Elo engine in Elo.py.
+
+Ratings live in their own collection (default "eloRatings"), one document per
+athlete:
+  {"athleteId": str, "elo": float, "version": int, "updatedAt": datetime,
+   "lastRaced": float (epoch seconds, for decay), "writeTokens": [str, ...]}
+
+Reads for a race are a single $in query; writes are a single unordered
+bulk_write. Every write is conditioned on the version that was read, so two
+incremental updaters touching the same athlete cannot silently overwrite each
+other; the loser gets an EloVersionConflict naming the athletes to retry.
+
+backfill_from_races streams a full history straight out of the races
+collection: the cursor is sorted by date, projected down to
+results.athleteId / results.overall, and consumed in batches that are packed
+into arrays for the engine, so memory stays flat however long the history is.
+
+Works against pymongo or a mongomock stand-in (pass the collection object).
+Requires pymongo: pip install pymongo
+"""
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from Elo import (
+    AuditSink,
+    EloProfiler,
+    EloStore,
+    PackedRaces,
+    RatingHistory,
+    _decayed,
+    _to_timestamp,
+    apply_race_update,
+    backfill_packed,
+)
+
+try:
+    from pymongo import ASCENDING, UpdateOne
+    from pymongo.errors import BulkWriteError
+except ImportError:  # pragma: no cover - dependency is optional until used
+    ASCENDING = 1
+    UpdateOne = None  # type: ignore[assignment]
+    BulkWriteError = None  # type: ignore[assignment]
+
+DUPLICATE_KEY = 11000
+# How many recent write tokens each document remembers (used to tell which
+# writes of a partially failed bulk_write actually landed)
+WRITE_TOKEN_HISTORY = 8
+
+
+class EloVersionConflict(RuntimeError):
+    """Raised when some rating writes lost an optimistic-concurrency race."""
+
+    def __init__(self, athlete_ids: List[str]):
+        super().__init__(f"{len(athlete_ids)} rating write(s) hit a version conflict")
+        self.athlete_ids = athlete_ids
+
+
+class MongoEloStore(EloStore):
+    """
+    EloStore whose source of truth is a Mongo collection.
+
+    The inherited in-memory array acts as a cache of the last values read or
+    written; get_many_idx always refreshes the requested athletes from Mongo
+    (one $in query) and records their document versions, and set_many_idx
+    writes them back with one unordered bulk_write guarded by those versions.
+    Each document also keeps lastRaced, so inactivity decay is applied on
+    read exactly as in the in-memory store.
+    """
+
+    def __init__(
+        self,
+        collection,
+        base_elo: float = 1400.0,
+        capacity: int = 1024,
+        ensure_indexes: bool = True,
+        decay_half_life: Optional[float] = None,
+        decay_target: Optional[float] = None
+    ):
+        if UpdateOne is None:
+            raise RuntimeError("Missing dependency: pymongo. Install with `python3 -m pip install pymongo`.")
+        super().__init__(base_elo=base_elo, capacity=capacity, decay_half_life=decay_half_life, decay_target=decay_target)
+        self.collection = collection
+        # Document version last seen per interned athlete (0 = no document yet)
+        self._versions = np.zeros(self._elos.size, dtype=np.int64)
+        if ensure_indexes:
+            self.collection.create_index([("athleteId", ASCENDING)], unique=True)
+
+    def _resize(self, cap: int) -> None:
+        super()._resize(cap)
+        versions = getattr(self, "_versions", None)
+        if versions is not None:
+            grown = np.zeros(cap, dtype=np.int64)
+            grown[:versions.size] = versions
+            self._versions = grown
+
+    def get_many(self, athlete_ids: List[str], at: Any = None) -> np.ndarray:
+        idx = self.intern(athlete_ids)
+        self._fetch(idx)
+        return super().get_many_idx(idx, at=self._read_time(at))
+
+    def peek_many(self, athlete_ids: List[str], at: Any = None) -> np.ndarray:
+        """Read straight from Mongo (one $in query) without interning or updating the cache."""
+        found: Dict[str, Dict[str, Any]] = {
+            doc["athleteId"]: doc
+            for doc in self.collection.find(
+                {"athleteId": {"$in": list(athlete_ids)}},
+                {"_id": 0, "athleteId": 1, "elo": 1, "lastRaced": 1},
+            )
+        }
+        docs = [found.get(a) for a in athlete_ids]
+        ratings = np.array([self.base_elo if d is None else float(d["elo"]) for d in docs], dtype=np.float64)
+        if self.decay_half_life is None or at is None:
+            return ratings
+        last = np.array([np.nan if d is None or d.get("lastRaced") is None else float(d["lastRaced"]) for d in docs])
+        return _decayed(ratings, last, _to_timestamp(at), self.decay_half_life, self.decay_target)
+
+    def _fetch(self, idx: np.ndarray) -> None:
+        idx = np.asarray(idx, dtype=np.int64)
+        ids = [self.athlete_id(i) for i in idx]
+        found: Dict[str, Dict[str, Any]] = {
+            doc["athleteId"]: doc
+            for doc in self.collection.find(
+                {"athleteId": {"$in": ids}},
+                {"_id": 0, "athleteId": 1, "elo": 1, "version": 1, "lastRaced": 1},
+            )
+        }
+        for i, a in zip(idx, ids):
+            doc = found.get(a)
+            if doc is None:
+                self._elos[i] = self.base_elo
+                self._versions[i] = 0
+                self._last_raced[i] = np.nan
+            else:
+                self._elos[i] = float(doc["elo"])
+                self._versions[i] = int(doc.get("version", 0))
+                last = doc.get("lastRaced")
+                self._last_raced[i] = np.nan if last is None else float(last)
+        if self._ranking is not None:
+            self._ranking.mark(idx)
+
+    def get_many_idx(self, idx: np.ndarray, at: Optional[float] = None) -> np.ndarray:
+        self._fetch(idx)
+        return super().get_many_idx(idx, at=at)
+
+    def set_many_idx(self, idx: np.ndarray, new_elos: np.ndarray, at: Optional[float] = None) -> None:
+        idx = np.asarray(idx, dtype=np.int64)
+        new_elos = np.asarray(new_elos, dtype=np.float64)
+        if idx.size == 0:
+            return
+
+        token = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        fields: Dict[str, Any] = {"updatedAt": now}
+        if at is not None and not np.isnan(at):
+            fields["lastRaced"] = float(at)
+        ops = []
+        for i, r in zip(idx, new_elos):
+            version = int(self._versions[i])
+            ops.append(UpdateOne(
+                {"athleteId": self.athlete_id(i), "version": version},
+                {
+                    "$set": {"elo": float(r), **fields},
+                    "$inc": {"version": 1},
+                    "$push": {"writeTokens": {"$each": [token], "$slice": -WRITE_TOKEN_HISTORY}},
+                },
+                upsert=(version == 0),
+            ))
+
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+            applied = result.matched_count + len(result.upserted_ids or {})
+        except BulkWriteError as exc:
+            # Duplicate keys are lost upserts (another writer created the doc first)
+            other = [e for e in exc.details.get("writeErrors", []) if e.get("code") != DUPLICATE_KEY]
+            if other:
+                raise
+            applied = exc.details.get("nMatched", 0) + exc.details.get("nUpserted", 0)
+
+        conflicts: List[str] = []
+        if applied < len(ops):
+            ids = [self.athlete_id(i) for i in idx]
+            conflicts = [
+                doc["athleteId"]
+                for doc in self.collection.find(
+                    {"athleteId": {"$in": ids}, "writeTokens": {"$ne": token}},
+                    {"_id": 0, "athleteId": 1},
+                )
+            ]
+
+        conflict_set = set(conflicts)
+        ok = np.array([self.athlete_id(i) not in conflict_set for i in idx], dtype=bool)
+        super().set_many_idx(idx[ok], new_elos[ok], at=at)
+        self._versions[idx[ok]] += 1
+        if conflicts:
+            raise EloVersionConflict(conflicts)
+
+
+def update_race_with_retry(
+    store: MongoEloStore,
+    athlete_ids: List[str],
+    finish_places: Iterable[int],
+    *,
+    max_retries: int = 3,
+    Klocal: float = 4.5,
+    Kglobal: float = 1.0,
+    alpha: float = 0.2,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    race_date: Any = None
+) -> np.ndarray:
+    """
+    Rate ONE race against a shared MongoEloStore, retrying athletes whose
+    write lost a version race. Each retry re-reads only the athletes not yet
+    committed; committed athletes keep the pre-race ratings of the first read,
+    so the race is rated against one consistent field, not partly against
+    its own results.
+    Returns the committed rating changes, aligned with athlete_ids.
+    race_date (optional) is the time ratings are decayed to and recorded at.
+    """
+    finish_positions = np.asarray(list(finish_places), dtype=np.int32) - 1
+    if len(athlete_ids) != finish_positions.size:
+        raise ValueError("athlete_ids and finish_places must be same length")
+
+    at = None if race_date is None else _to_timestamp(race_date)
+    idx = store.intern(athlete_ids)
+    committed_delta = np.zeros(idx.size, dtype=np.float64)
+    pending = np.ones(idx.size, dtype=bool)
+    old_elos = store.get_many_idx(idx, at=at)
+    for attempt in range(max_retries + 1):
+        if attempt:
+            old_elos[pending] = store.get_many_idx(idx[pending], at=at)
+        new_elos, delta = apply_race_update(
+            old_elos, finish_positions,
+            Klocal=Klocal, Kglobal=Kglobal, alpha=alpha, window=window, max_change=max_change,
+        )
+        try:
+            store.set_many_idx(idx[pending], new_elos[pending], at=at)
+            committed_delta[pending] = delta[pending]
+            return committed_delta
+        except EloVersionConflict as exc:
+            lost_ids = set(exc.athlete_ids)
+            lost = np.array([a in lost_ids for a in athlete_ids], dtype=bool)
+            won = pending & ~lost
+            committed_delta[won] = delta[won]
+            pending &= lost
+    raise EloVersionConflict([a for a, p in zip(athlete_ids, pending) if p])
+
+
+# --------------------------------------------
+# Streaming backfill from the races collection
+# --------------------------------------------
+
+RACE_PROJECTION = {"_id": 0, "raceId": 1, "date": 1, "results.athleteId": 1, "results.overall": 1}
+RACE_SORT = [("date", ASCENDING), ("raceId", ASCENDING)]
+# Overall place recorded for non-finishers
+DNF_PLACE = 99999
+
+
+class RaceBatch(NamedTuple):
+    """A run of consecutive races: packed results plus per-race date and raceId."""
+    packed: PackedRaces
+    dates: List[Any]
+    race_ids: List[Optional[str]]
+
+
+def pack_race_docs(store: EloStore, docs: List[Dict[str, Any]]) -> RaceBatch:
+    """
+    Compile race documents (already in date order) into a RaceBatch,
+    interning every athlete into the store with one call for the batch.
+    Results without an athleteId or an overall place, and non-finishers,
+    are skipped; the rest are re-ranked 1..n by overall place (ties share
+    a place), so gaps left by skipped results do not skew percentiles.
+    """
+    ids: List[str] = []
+    places: List[int] = []
+    sizes = np.zeros(len(docs), dtype=np.int64)
+    dates: List[Any] = []
+    race_ids: List[Optional[str]] = []
+    for r, doc in enumerate(docs):
+        n = 0
+        for result in doc.get("results") or ():
+            athlete_id = result.get("athleteId")
+            overall = result.get("overall")
+            if not athlete_id or not overall or overall >= DNF_PLACE:
+                continue
+            ids.append(str(athlete_id))
+            places.append(int(overall))
+            n += 1
+        sizes[r] = n
+        dates.append(doc.get("date"))
+        race_ids.append(doc.get("raceId"))
+
+    offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    athlete_idx = store.intern(ids) if ids else np.empty(0, dtype=np.int64)
+
+    # 0-based finish positions within each race, ties -> lowest position
+    m = len(places)
+    place_arr = np.asarray(places, dtype=np.int64)
+    race_of = np.repeat(np.arange(len(docs), dtype=np.int64), sizes)
+    order = np.lexsort((place_arr, race_of))
+    sorted_place, sorted_race = place_arr[order], race_of[order]
+    first = np.ones(m, dtype=bool)
+    first[1:] = (sorted_place[1:] != sorted_place[:-1]) | (sorted_race[1:] != sorted_race[:-1])
+    tie_start = np.maximum.accumulate(np.where(first, np.arange(m, dtype=np.int64), 0))
+    finish_positions = np.empty(m, dtype=np.int32)
+    finish_positions[order] = tie_start - offsets[:-1][sorted_race]
+    return RaceBatch(PackedRaces(athlete_idx, finish_positions, offsets), dates, race_ids)
+
+
+def iter_race_batches(
+    races,
+    store: EloStore,
+    *,
+    query: Optional[Dict[str, Any]] = None,
+    batch_size: int = 500
+) -> Iterator[RaceBatch]:
+    """
+    Yield RaceBatches of up to `batch_size` races from the races collection,
+    oldest first (ties by raceId). `query` narrows the races read
+    (e.g. {"date": {"$gt": last_backfilled}}).
+    """
+    cursor = races.find(query or {}, RACE_PROJECTION).sort(RACE_SORT)
+    cursor = cursor.batch_size(batch_size)
+    docs: List[Dict[str, Any]] = []
+    for doc in cursor:
+        docs.append(doc)
+        if len(docs) >= batch_size:
+            yield pack_race_docs(store, docs)
+            docs = []
+    if docs:
+        yield pack_race_docs(store, docs)
+
+
+def backfill_from_races(
+    store: EloStore,
+    races,
+    *,
+    query: Optional[Dict[str, Any]] = None,
+    batch_size: int = 500,
+    Klocal: float = 4.5,
+    Kglobal: float = 1.0,
+    alpha: float = 0.2,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    history: Optional[RatingHistory] = None,
+    audit: Optional[AuditSink] = None,
+    profiler: Optional[EloProfiler] = None,
+    fast_math: bool = False
+) -> int:
+    """
+    Backfill `store` from the Mongo races collection in date order without
+    materialising the history: only one batch of projected documents and its
+    packed arrays is alive at a time. Ratings match backfill_all_races on
+    the same races. Returns the number of races processed.
+    """
+    n_races = 0
+    for batch in iter_race_batches(races, store, query=query, batch_size=batch_size):
+        backfill_packed(
+            store, batch.packed,
+            Klocal=Klocal, Kglobal=Kglobal, alpha=alpha, window=window, max_change=max_change,
+            history=history, race_dates=batch.dates, audit=audit, profiler=profiler, fast_math=fast_math,
+        )
+        n_races += batch.packed.n_races
+    return n_races
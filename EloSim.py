@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+"""
+Vectorized season simulator for the Elo engine in Elo.py.
+
+Runs many independent simulated seasons at once. Ratings are a
+(seed x athlete) array, every race is one apply_batched_update call over all
+seeds, and the recorded history is a (seed x race x athlete) array, so the
+cost per race does not grow with Python-level loops over seeds or athletes.
+
+Race model (as in EloTesting): every athlete starts every race;
+performance = strength + N(0, noise_sd), and each athlete has an
+upset_prob chance of a +/- upset_min..upset_max swing. Strength is the
+athlete's current rating unless a fixed latent `skill` is given.
+
+ConvergenceStats accumulates per-athlete season statistics online
+(Welford running moments), so stability metrics need O(seeds x athletes)
+memory however many races a season has; the full history is only kept
+when asked for. Pairwise log-loss is scored in bounded blocks of pairs,
+so it adds no per-pair state either.
+
+run_sweep evaluates a parameter grid (Klocal / Kglobal / alpha /
+max_change / decay) across a process pool. Every cell gets its own seed,
+derived from the base seed and the cell's parameters, and finished cells
+are appended to a JSON-lines file as they complete. A rerun with the same
+file skips them, so an interrupted sweep resumes, and the summary table is
+the same whatever the worker count. successive_halving searches the same
+space adaptively: every configuration gets a short simulation, and only the
+best 1/eta move on to runs eta times longer.
+
+Usage examples (from repo root):
+  python EloSim.py                                  # 1000 seasons, 200 athletes
+  python EloSim.py --seeds 200 --athletes 50 --races 40 --seed 7
+  python EloSim.py --sweep sweep.jsonl --processes 8 --seeds 50 --races 10 --athletes 5
+  python EloSim.py --tune log_loss --skill-sd 20 --seeds 50 --athletes 5
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import time
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from Elo import _expected_win_prob, apply_batched_update
+
+
+class ConvergenceStats:
+    """
+    Online per-athlete statistics over a season, (seeds, athletes) arrays
+    updated once per race:
+      - Welford mean / M2 of each athlete's rating across races
+      - Welford mean / M2 of each athlete's absolute step per race
+      - each athlete's rank in the field and the last race it changed
+      - optionally, the running pairwise log-loss of pre-race ratings
+        (scored in bounded blocks of pairs, so it adds no n^2 state)
+    """
+
+    def __init__(self, shape: Tuple[int, int], log_loss: bool = False):
+        self.count = 0
+        self.rating_mean = np.zeros(shape, dtype=np.float64)
+        self.rating_m2 = np.zeros(shape, dtype=np.float64)
+        self.step_mean = np.zeros(shape, dtype=np.float64)
+        self.step_m2 = np.zeros(shape, dtype=np.float64)
+        self.rank = np.full(shape, -1, dtype=np.int64)
+        self.last_rank_change = np.full(shape, -1, dtype=np.int64)
+        self.log_loss_sum = np.zeros(shape[0], dtype=np.float64) if log_loss else None
+        self.n_pairs = shape[1] * (shape[1] - 1) // 2
+
+    @staticmethod
+    def _welford(mean: np.ndarray, m2: np.ndarray, x: np.ndarray, count: int) -> None:
+        d = x - mean
+        mean += d / count
+        m2 += d * (x - mean)
+
+    def update(self, before: np.ndarray, ratings: np.ndarray, positions: np.ndarray) -> None:
+        """Fold in one race: pre-race ratings, post-race ratings and 0-based places."""
+        self.count += 1
+        self._welford(self.rating_mean, self.rating_m2, ratings, self.count)
+        self._welford(self.step_mean, self.step_m2, np.abs(ratings - before), self.count)
+
+        rank = np.empty_like(self.rank)
+        np.put_along_axis(rank, np.argsort(-ratings, axis=1, kind="mergesort"), np.arange(rank.shape[1]), axis=1)
+        self.last_rank_change[rank != self.rank] = self.count - 1
+        self.rank = rank
+
+        if self.log_loss_sum is not None:
+            self.log_loss_sum += _race_log_loss(before, positions)
+
+    def summary(self, final: np.ndarray, skill: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Per-season metrics, each shape (seeds,):
+          rating_std: athletes' mean std of rating across races
+          mean_abs_step / step_std: mean and std of |rating change| per race
+          races_to_stability: races until an athlete holds its final rank
+            for the rest of the season, averaged over athletes
+          rank_corr: Spearman correlation of final ratings with skill
+            (NaN without a latent skill)
+          log_loss: mean pairwise log-loss of pre-race ratings (if tracked)
+        """
+        n = max(self.count, 1)
+        if skill is None:
+            rank_corr = np.full(final.shape[0], np.nan)
+        else:
+            rank_corr = spearman_rows(final, np.broadcast_to(skill, final.shape))
+        out = {
+            "rating_std": np.sqrt(self.rating_m2 / n).mean(axis=1),
+            "mean_abs_step": self.step_mean.mean(axis=1),
+            "step_std": np.sqrt(self.step_m2 / n).mean(axis=1),
+            "races_to_stability": (self.last_rank_change + 1).mean(axis=1).astype(np.float64),
+            "rank_corr": rank_corr,
+        }
+        if self.log_loss_sum is not None:
+            out["log_loss"] = self.log_loss_sum / max(self.count * self.n_pairs, 1)
+        return out
+
+
+def spearman_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise Spearman rank correlation of two (rows, n) arrays (ties broken by order)."""
+    ra = np.argsort(np.argsort(a, axis=1, kind="mergesort"), axis=1).astype(np.float64)
+    rb = np.argsort(np.argsort(b, axis=1, kind="mergesort"), axis=1).astype(np.float64)
+    ra -= ra.mean(axis=1, keepdims=True)
+    rb -= rb.mean(axis=1, keepdims=True)
+    denom = np.sqrt((ra * ra).sum(axis=1) * (rb * rb).sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (ra * rb).sum(axis=1) / denom
+
+
+class SimResult(NamedTuple):
+    """
+    final: (seeds, athletes) ratings after the last race.
+    history: (seeds, races + 1, athletes) ratings, row 0 = starting ratings
+      (None when record_history=False).
+    finish_positions: (seeds, races, athletes) 0-based places
+      (None when record_history=False).
+    convergence: ConvergenceStats.summary() per-season metrics
+      (None when track_convergence=False).
+    """
+    final: np.ndarray
+    history: Optional[np.ndarray]
+    finish_positions: Optional[np.ndarray]
+    convergence: Optional[Dict[str, np.ndarray]] = None
+
+
+def simulate_finish_positions(
+    rng: np.random.Generator,
+    strength: np.ndarray,
+    noise_sd: float = 3.0,
+    upset_prob: float = 0.025,
+    upset_min: int = 20,
+    upset_max: int = 40
+) -> np.ndarray:
+    """0-based finish positions, (seeds, athletes), for one race per seed."""
+    shape = strength.shape
+    performance = strength + rng.normal(0.0, noise_sd, size=shape)
+    upset = rng.random(shape) < upset_prob
+    swing = rng.integers(upset_min, upset_max, size=shape).astype(np.float64)
+    swing[rng.random(shape) < 0.5] *= -1.0
+    performance += np.where(upset, swing, 0.0)
+
+    order = np.argsort(-performance, axis=1, kind="mergesort")
+    positions = np.empty(shape, dtype=np.int32)
+    np.put_along_axis(positions, order, np.broadcast_to(np.arange(shape[1], dtype=np.int32), shape), axis=1)
+    return positions
+
+
+def simulate_seasons(
+    n_seeds: int,
+    n_races: int,
+    n_athletes: int,
+    *,
+    Klocal: float = 4.5,
+    Kglobal: float = 1.0,
+    alpha: float = 0.2,
+    window: int = 3,
+    max_change: Optional[float] = 20.0,
+    base_elo: float = 1400.0,
+    skill: Optional[np.ndarray] = None,
+    noise_sd: float = 3.0,
+    upset_prob: float = 0.025,
+    upset_min: int = 20,
+    upset_max: int = 40,
+    decay: float = 1.0,
+    seed: int = 0,
+    record_history: bool = True,
+    track_convergence: bool = False,
+    track_log_loss: bool = False,
+    fast_math: bool = False
+) -> SimResult:
+    """
+    Simulate n_seeds independent seasons of n_races races between the same
+    n_athletes. skill (optional, (athletes,) or (seeds, athletes)) is a fixed
+    latent strength on the rating scale; without it races are decided by
+    current ratings plus noise, as in EloTesting. After every race ratings
+    regress toward base_elo: r = r * decay + base_elo * (1 - decay).
+    track_convergence adds ConvergenceStats metrics, computed online
+    without the history; track_log_loss also accumulates pairwise_log_loss
+    there (O(athletes^2) work per race). Results are reproducible for a
+    given (seed, n_seeds).
+    """
+    rng = np.random.default_rng(seed)
+    ratings = np.full((n_seeds, n_athletes), base_elo, dtype=np.float64)
+    if skill is not None:
+        skill = np.broadcast_to(np.asarray(skill, dtype=np.float64), (n_seeds, n_athletes))
+
+    history = finish = None
+    if record_history:
+        history = np.empty((n_seeds, n_races + 1, n_athletes), dtype=np.float64)
+        history[:, 0] = ratings
+        finish = np.empty((n_seeds, n_races, n_athletes), dtype=np.int32)
+    stats = None
+    if track_convergence or track_log_loss:
+        stats = ConvergenceStats((n_seeds, n_athletes), log_loss=track_log_loss)
+
+    for r in range(n_races):
+        positions = simulate_finish_positions(
+            rng, ratings if skill is None else skill,
+            noise_sd=noise_sd, upset_prob=upset_prob, upset_min=upset_min, upset_max=upset_max,
+        )
+        before = ratings
+        ratings, _ = apply_batched_update(
+            ratings, positions,
+            Klocal=Klocal, Kglobal=Kglobal, alpha=alpha, window=window, max_change=max_change, fast_math=fast_math,
+        )
+        if decay != 1.0:
+            ratings = ratings * decay + base_elo * (1.0 - decay)
+        if stats is not None:
+            stats.update(before, ratings, positions)
+        if record_history:
+            history[:, r + 1] = ratings
+            finish[:, r] = positions
+
+    convergence = None if stats is None else stats.summary(ratings, skill)
+    return SimResult(ratings, history, finish, convergence)
+
+
+def volatility(final: np.ndarray) -> np.ndarray:
+    """Spread of final ratings per season (std over athletes), shape (seeds,)."""
+    return final.std(axis=-1)
+
+
+def pairwise_log_loss(history: np.ndarray, finish_positions: np.ndarray, eps: float = 1e-12) -> np.ndarray:
+    """
+    Predictive log-loss per season, shape (seeds,): every pair in every race
+    is scored with the Elo win probability from the pre-race ratings.
+    Takes SimResult.history / finish_positions.
+    """
+    n_seeds, n_races, n_athletes = finish_positions.shape
+    total = np.zeros(n_seeds, dtype=np.float64)
+    for r in range(n_races):
+        total += _race_log_loss(history[:, r], finish_positions[:, r], eps)
+    return total / max(n_races * (n_athletes * (n_athletes - 1) // 2), 1)
+
+
+def _race_log_loss(
+    before: np.ndarray,
+    positions: np.ndarray,
+    eps: float = 1e-12,
+    chunk_elements: int = 1_000_000
+) -> np.ndarray:
+    """
+    Summed log-loss of every pair i < j in one race, per seed, from the
+    pre-race ratings. Pairs are scored a block of anchors i at a time
+    (~chunk_elements (seed, i, j) values per block), so temporaries stay
+    O(chunk_elements + seeds x athletes) whatever the field size.
+    """
+    n_seeds, n = before.shape
+    total = np.zeros(n_seeds, dtype=np.float64)
+    rows = max(1, chunk_elements // max(n_seeds * n, 1))
+    for lo in range(0, n - 1, rows):
+        hi = min(lo + rows, n - 1)
+        upper = np.arange(lo + 1, n)[None, :] > np.arange(lo, hi)[:, None]  # j > i within the block
+        p_i = _expected_win_prob(before[:, None, lo + 1:] - before[:, lo:hi, None])
+        np.clip(p_i, eps, 1.0 - eps, out=p_i)
+        i_won = positions[:, lo:hi, None] < positions[:, None, lo + 1:]
+        loss = np.where(i_won, np.log(p_i), np.log1p(-p_i))
+        total -= np.where(upper, loss, 0.0).sum(axis=(1, 2))
+    return total
+
+
+# --------------------------------------------
+# Parameter sweeps
+# --------------------------------------------
+
+SWEEP_PARAMS = ("Klocal", "Kglobal", "alpha", "max_change", "decay")
+OBJECTIVES = ("volatility", "log_loss")  # both minimized
+
+# The EloTesting grid: 10 x 5 x 10 x 10 x 1 = 5,000 cells
+DEFAULT_GRID: Dict[str, Sequence[float]] = {
+    "Klocal": np.linspace(4.5, 5.5, 10).tolist(),
+    "Kglobal": np.linspace(0.5, 2, 5).tolist(),
+    "alpha": np.linspace(0.15, 0.25, 10).tolist(),
+    "max_change": np.linspace(15, 22.5, 10).tolist(),
+    "decay": [1.0],
+}
+
+
+def param_grid(grid: Dict[str, Sequence[float]]) -> List[Dict[str, float]]:
+    """Cartesian product of the grid axes, in SWEEP_PARAMS order (cell i = row i)."""
+    unknown = set(grid) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    names = [p for p in SWEEP_PARAMS if p in grid]
+    return [dict(zip(names, map(float, values))) for values in itertools.product(*(grid[p] for p in names))]
+
+
+def cell_seed(base_seed: int, params: Dict[str, float]) -> int:
+    """Seed for one cell: a function of the base seed and the cell's parameter values only."""
+    digest = hashlib.blake2b(json.dumps(params, sort_keys=True).encode("utf-8"), digest_size=8).digest()
+    entropy = [int(base_seed), int.from_bytes(digest, "little")]
+    return int(np.random.SeedSequence(entropy).generate_state(1, dtype=np.uint64)[0])
+
+
+def run_cell(
+    params: Dict[str, float],
+    *,
+    n_seeds: int,
+    n_races: int,
+    n_athletes: int,
+    base_seed: int = 0,
+    log_loss: bool = False,
+    skill_sd: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Simulate one grid cell; returns its summary row: params, volatility and
+    the ConvergenceStats metrics (season means; rank_corr is None without
+    skill_sd). log_loss adds the mean pairwise_log_loss, accumulated online
+    (no history is kept). skill_sd, if set, gives each
+    season fixed latent skills ~ N(base, skill_sd) that decide the races
+    (drawn from the cell seed, so they are the same at every budget).
+    """
+    seed = cell_seed(base_seed, params)
+    skill = None
+    if skill_sd is not None:
+        skill = np.random.default_rng([seed, 1]).normal(1400.0, skill_sd, size=(n_seeds, n_athletes))
+    result = simulate_seasons(
+        n_seeds, n_races, n_athletes,
+        skill=skill, seed=seed, record_history=False, track_convergence=True, track_log_loss=log_loss, **params,
+    )
+    vol = volatility(result.final)
+    row = {
+        **params,
+        "seed": seed,
+        "volatility": float(vol.mean()),
+        "volatility_sd": float(vol.std()),
+    }
+    for name, values in result.convergence.items():
+        row[name] = float(np.nanmean(values)) if not np.isnan(values).all() else None
+    return row
+
+
+def _sweep_worker(task: Dict[str, Any]) -> Dict[str, Any]:
+    cell = task.pop("cell")
+    return {"cell": cell, **run_cell(**task)}
+
+
+def _read_sweep_rows(path: Path) -> Tuple[Optional[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """(settings header, rows by cell) of a sweep file; (None, {}) if it does not exist."""
+    settings: Optional[Dict[str, Any]] = None
+    rows: Dict[int, Dict[str, Any]] = {}
+    if not path.exists():
+        return settings, rows
+    with path.open() as handle:
+        for line in handle:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted run
+            if "settings" in row:
+                settings = row["settings"]
+            else:
+                rows[int(row["cell"])] = row
+    return settings, rows
+
+
+def run_sweep(
+    grid: Union[Dict[str, Sequence[float]], List[Dict[str, float]]],
+    out: Union[str, Path],
+    *,
+    n_seeds: int = 50,
+    n_races: int = 10,
+    n_athletes: int = 5,
+    base_seed: int = 0,
+    log_loss: bool = False,
+    skill_sd: Optional[float] = None,
+    processes: Optional[int] = None,
+    progress: bool = False
+) -> pd.DataFrame:
+    """
+    Run every cell of `grid` (axes dict or explicit cell list) and return
+    the summary table sorted by cell index. `out` (JSON lines) starts with a
+    {"settings": ...} header holding the run settings (n_seeds, n_races,
+    n_athletes, base_seed, log_loss, skill_sd); each finished cell is then
+    appended and flushed. Cells already in `out` are not rerun; the file
+    must have been written with the same settings and grid (ValueError
+    otherwise). log_loss / skill_sd go to run_cell. processes=1 runs in-process; the table does not depend on
+    the worker count.
+    """
+    cells = param_grid(grid) if isinstance(grid, dict) else [dict(c) for c in grid]
+    settings = {
+        "n_seeds": n_seeds, "n_races": n_races, "n_athletes": n_athletes, "base_seed": base_seed,
+        "log_loss": log_loss, "skill_sd": skill_sd,
+    }
+    out = Path(out)
+    saved, done = _read_sweep_rows(out)
+    if saved is None and done:
+        raise ValueError(f"{out} has no settings header; cannot tell which experiment its rows belong to")
+    if saved is not None and saved != json.loads(json.dumps(settings)):
+        changed = sorted(k for k in set(saved) | set(settings) if saved.get(k) != settings.get(k))
+        raise ValueError(f"{out} was written with different settings ({', '.join(changed)})")
+    for cell, row in done.items():
+        if cell >= len(cells) or any(row.get(k) != v for k, v in cells[cell].items()):
+            raise ValueError(f"{out} holds results for a different grid (cell {cell})")
+
+    tasks = [{"cell": i, "params": cells[i], **settings} for i in range(len(cells)) if i not in done]
+
+    ctx = get_context()
+    processes = processes or ctx.cpu_count()
+    with out.open("a") as handle:
+        if out.stat().st_size and not out.read_bytes().endswith(b"\n"):
+            handle.write("\n")  # terminate a torn line so new rows parse
+        if saved is None:
+            handle.write(json.dumps({"settings": settings}) + "\n")
+        def record(row: Dict[str, Any]) -> None:
+            handle.write(json.dumps(row) + "\n")
+            handle.flush()
+            done[row["cell"]] = row
+            if progress and len(done) % 100 == 0:
+                print(f"{len(done)}/{len(cells)} cells")
+
+        if processes <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                record(_sweep_worker(task))
+        else:
+            with ctx.Pool(processes) as pool:
+                for row in pool.imap_unordered(_sweep_worker, tasks, chunksize=max(1, len(tasks) // (processes * 16))):
+                    record(row)
+
+    table = pd.DataFrame([done[i] for i in sorted(done)])
+    return table.set_index("cell")
+
+
+class HalvingResult(NamedTuple):
+    """
+    best: summary row of the winning configuration at the largest budget.
+    rungs: every evaluation, one row per (rung, cell), with its n_races.
+    race_budget: simulated races spent (summed over configurations).
+    """
+    best: Dict[str, Any]
+    rungs: pd.DataFrame
+    race_budget: int
+
+
+def successive_halving(
+    grid: Union[Dict[str, Sequence[float]], List[Dict[str, float]]],
+    *,
+    objective: str = "volatility",
+    eta: int = 3,
+    min_races: int = 2,
+    max_races: int = 54,
+    n_seeds: int = 50,
+    n_athletes: int = 5,
+    base_seed: int = 0,
+    skill_sd: Optional[float] = None,
+    processes: Optional[int] = None,
+    progress: bool = False
+) -> HalvingResult:
+    """
+    Successive halving over the grid: rung k simulates min_races * eta**k
+    races for each survivor and keeps the best ceil(n / eta) by `objective`
+    (ties go to the lower cell index). Stops once one configuration is left
+    or the next rung would exceed max_races. Cells keep their run_sweep seed
+    at every rung, and results do not depend on the worker count.
+    objective="log_loss" is accumulated online in bounded blocks of pairs
+    (_race_log_loss), so memory per rung does not grow with n_athletes^2.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}; expected one of {OBJECTIVES}")
+    if eta < 2 or min_races < 1 or max_races < min_races:
+        raise ValueError("Need eta >= 2 and 1 <= min_races <= max_races")
+
+    cells = param_grid(grid) if isinstance(grid, dict) else [dict(c) for c in grid]
+    settings = {
+        "n_seeds": n_seeds, "n_athletes": n_athletes, "base_seed": base_seed,
+        "log_loss": objective == "log_loss", "skill_sd": skill_sd,
+    }
+    survivors = list(range(len(cells)))
+    n_races = min_races
+    frames: List[pd.DataFrame] = []
+    budget = 0
+
+    ctx = get_context()
+    processes = processes or ctx.cpu_count()
+    pool = ctx.Pool(processes) if processes > 1 else None
+    try:
+        for rung in itertools.count():
+            tasks = [{"cell": i, "params": cells[i], "n_races": n_races, **settings} for i in survivors]
+            if pool is not None:
+                rows = pool.map(_sweep_worker, tasks, chunksize=max(1, len(tasks) // (processes * 4)))
+            else:
+                rows = [_sweep_worker(task) for task in tasks]
+            budget += n_races * len(rows)
+
+            frame = pd.DataFrame(rows).assign(rung=rung, n_races=n_races)
+            frame = frame.sort_values([objective, "cell"], kind="mergesort").reset_index(drop=True)
+            frames.append(frame)
+            if progress:
+                print(f"rung {rung}: {len(rows)} configs x {n_races} races, best {objective} {frame[objective].iloc[0]:.4f}")
+
+            if len(survivors) == 1 or n_races * eta > max_races:
+                break
+            survivors = frame["cell"].iloc[:math.ceil(len(survivors) / eta)].tolist()
+            n_races *= eta
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    best = frames[-1].to_dict("records")[0]
+    return HalvingResult(best, pd.concat(frames, ignore_index=True), budget)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate many Elo seasons at once.")
+    parser.add_argument("--seeds", type=int, default=1000, help="Independent seasons (default: 1000).")
+    parser.add_argument("--races", type=int, default=20, help="Races per season (default: 20).")
+    parser.add_argument("--athletes", type=int, default=200, help="Athletes per race (default: 200).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--fast-math", action="store_true", help="Use the float32 / lookup-table kernel.")
+    parser.add_argument("--sweep", default=None, help="Run the default parameter grid, streaming rows to this JSON-lines file.")
+    parser.add_argument("--processes", type=int, default=None, help="Sweep worker processes (default: CPU count).")
+    parser.add_argument("--tune", choices=OBJECTIVES, default=None, help="Successive halving over the default grid, minimizing this objective.")
+    parser.add_argument("--eta", type=int, default=3, help="Halving rate for --tune (default: 3).")
+    parser.add_argument("--min-races", type=int, default=2, help="Races per config in the first --tune rung (default: 2).")
+    parser.add_argument("--max-races", type=int, default=54, help="Race budget cap per config for --tune (default: 54).")
+    parser.add_argument("--skill-sd", type=float, default=None, help="Fixed latent skill spread (enables rank_corr; also used by --tune / --sweep).")
+    args = parser.parse_args()
+
+    if args.tune:
+        start = time.perf_counter()
+        result = successive_halving(
+            DEFAULT_GRID, objective=args.tune, eta=args.eta, min_races=args.min_races, max_races=args.max_races,
+            n_seeds=args.seeds, n_athletes=args.athletes, base_seed=args.seed, skill_sd=args.skill_sd,
+            processes=args.processes, progress=True,
+        )
+        full = len(param_grid(DEFAULT_GRID)) * int(result.rungs["n_races"].max())
+        print(f"best ({time.perf_counter() - start:.1f}s, {result.race_budget} of {full} grid races): {result.best}")
+        return
+
+    if args.sweep:
+        table = run_sweep(
+            DEFAULT_GRID, args.sweep,
+            n_seeds=args.seeds, n_races=args.races, n_athletes=args.athletes,
+            base_seed=args.seed, skill_sd=args.skill_sd, processes=args.processes, progress=True,
+        )
+        print(table.sort_values("volatility").to_string())
+        return
+
+    start = time.perf_counter()
+    skill = None
+    if args.skill_sd is not None:
+        skill = np.random.default_rng([args.seed, 1]).normal(1400.0, args.skill_sd, size=(args.seeds, args.athletes))
+    result = simulate_seasons(
+        args.seeds, args.races, args.athletes,
+        skill=skill, seed=args.seed, record_history=False, track_convergence=True, fast_math=args.fast_math,
+    )
+    elapsed = time.perf_counter() - start
+
+    vol = volatility(result.final)
+    print(
+        f"{args.seeds} seasons x {args.races} races x {args.athletes} athletes in {elapsed:.2f}s; "
+        f"volatility mean {vol.mean():.3f} (sd {vol.std():.3f})"
+    )
+    for name, values in result.convergence.items():
+        print(f"  {name}: {np.nanmean(values):.3f}" if not np.isnan(values).all() else f"  {name}: n/a")
+
+
+if __name__ == "__main__":
+    main()
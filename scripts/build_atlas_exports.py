@@ -21,6 +21,7 @@ from pathlib import Path
 from datetime import datetime
 
 from ingest_races import finalize_athletes, process_race_file
+from write_elo_scores import rate_race_docs
 
 try:
     from bson import ObjectId
@@ -81,7 +82,8 @@ def main() -> None:
   for csv_path in sorted(data_dir.glob("*/*.csv")):
     race_docs.append(process_race_file(csv_path, athletes))
 
-  athlete_docs = finalize_athletes(athletes)
+  ratings, changes = rate_race_docs(race_docs)
+  athlete_docs = finalize_athletes(athletes, ratings, changes)
 
   write_ndjson(out_dir / "races.ndjson", _attach_object_ids(race_docs))
   write_ndjson(out_dir / "athletes.ndjson", _attach_object_ids(athlete_docs))
@@ -6,6 +6,9 @@ The script builds:
 - races collection documents shaped like lib/data.ts: RaceProfile
 - athletes collection documents shaped like lib/data.ts: Athlete
 
+Athlete eloScore and recentRaces[].eloChange come from running the Elo engine
+(Elo.py) over the ingested races in date order (see write_elo_scores.py).
+
 Usage examples (from repo root):
   python scripts/ingest_races.py --dry-run
   python scripts/ingest_races.py --mongo-uri "$MONGODB_URI"
@@ -23,6 +26,8 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
+from write_elo_scores import START_RATING, elo_change, elo_score, rate_race_docs
+
 try:
     from pymongo import MongoClient
 except ImportError:
@@ -167,7 +172,6 @@ def update_athlete(
     finish_time: str,
     finish_seconds: int | None,
     placement: Tuple[int, int, int],
-    points: int | None,
 ) -> None:
     overall_rank, gender_rank, division_rank = placement
     athlete = athletes.setdefault(
@@ -183,7 +187,6 @@ def update_athlete(
             "isClaimed": False,
             "prs": {},
             "recentRaces": [],
-            "_elo_scores": [],
         },
     )
 
@@ -191,8 +194,6 @@ def update_athlete(
         athlete["age"] = age_from_age_group(age_group)
     if not athlete.get("country"):
         athlete["country"] = country or "UNK"
-    if points:
-        athlete["_elo_scores"].append(points)
 
     race_summary = {
         "raceId": race_meta["raceId"],
@@ -269,7 +270,6 @@ def process_race_file(csv_path: Path, athletes: Dict[str, Dict[str, Any]]) -> Di
                 finish_time=finish_time,
                 finish_seconds=finish_seconds,
                 placement=(overall_rank, gender_rank, division_rank),
-                points=safe_int(row.get("Points")),
             )
 
     results.sort(key=lambda entry: entry.get("overall") or 0)
@@ -290,11 +290,17 @@ def process_race_file(csv_path: Path, athletes: Dict[str, Dict[str, Any]]) -> Di
     }
 
 
-def finalize_athletes(athletes: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+def finalize_athletes(
+    athletes: Dict[str, Dict[str, Any]],
+    ratings: Dict[str, float],
+    changes: Dict[str, Dict[str, float]],
+) -> List[Dict[str, Any]]:
     finalized: List[Dict[str, Any]] = []
     for athlete in athletes.values():
+        race_changes = changes.get(athlete["athleteId"], {})
         distance_best: Dict[str, Tuple[int, Dict[str, Any]]] = {}
         for race in athlete["recentRaces"]:
+            race["eloChange"] = elo_change(race_changes.get(race["raceId"], 0.0))
             finish_sec = race.pop("_finishSec", None)
             distance_key = race.pop("_distanceKey", None)
             if distance_key and finish_sec is not None:
@@ -318,8 +324,8 @@ def finalize_athletes(athletes: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any
 
         athlete["recentRaces"].sort(key=lambda r: r["date"], reverse=True)
 
-        elo_scores = [score for score in athlete.pop("_elo_scores", []) if isinstance(score, int) and score > 0]
-        athlete["eloScore"] = int(sum(elo_scores) / len(elo_scores)) if elo_scores else 1500
+        rating = ratings.get(athlete["athleteId"])
+        athlete["eloScore"] = elo_score(rating) if rating is not None else int(START_RATING)
         finalized.append(athlete)
     return finalized
 
@@ -369,7 +375,8 @@ def main() -> None:
     for csv_path in sorted(data_dir.glob("*/*.csv")):
         race_docs.append(process_race_file(csv_path, athletes))
 
-    athlete_docs = finalize_athletes(athletes)
+    ratings, changes = rate_race_docs(race_docs)
+    athlete_docs = finalize_athletes(athletes, ratings, changes)
 
     print(f"Prepared {len(race_docs)} race documents and {len(athlete_docs)} athlete documents.")
 
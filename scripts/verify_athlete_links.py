@@ -10,6 +10,8 @@ The script:
   - Checks every race result for a non-empty athleteId.
   - Ensures each referenced athlete exists in the athletes collection.
   - Creates placeholder athlete profiles for any missing athletes (unless --dry-run).
+    Placeholders start at eloScore 1500 with eloChange 0 on every race; run
+    scripts/write_elo_scores.py afterwards to fill in real ratings.
 """
 from __future__ import annotations
 
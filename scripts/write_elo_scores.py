@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Run the Elo engine (Elo.py) over every race in MongoDB and write the results
+back onto athlete documents:
+  - athletes.eloScore: rating after the athlete's latest race
+  - athletes.recentRaces[].eloChange: rating change from that race
+
+Races stream from the races collection in date order, projected down to the
+fields the engine needs. Only athletes whose stored values differ from the
+computed ones get an update, sent as unordered bulk_write batches.
+
+Usage (from repo root):
+  python scripts/write_elo_scores.py --dry-run
+  python scripts/write_elo_scores.py --mongo-uri "$MONGODB_URI" --db data
+
+Requires pymongo: pip install pymongo
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Elo import EloStore, RatingHistory, backfill_packed  # noqa: E402
+from EloMongo import RaceBatch, iter_race_batches, pack_race_docs  # noqa: E402
+
+try:
+    from pymongo import MongoClient, UpdateOne
+except ImportError:  # pragma: no cover - dependency is optional until used
+    MongoClient = None  # type: ignore[assignment]
+    UpdateOne = None  # type: ignore[assignment]
+
+try:
+    import certifi
+except ImportError:  # pragma: no cover
+    certifi = None
+
+START_RATING = 1500.0
+ELO_CHANGE_DIGITS = 1
+
+Ratings = Dict[str, float]
+RaceChanges = Dict[str, Dict[str, float]]  # athleteId -> raceId -> delta
+
+
+def compute_elo(store: EloStore, batches: Iterable[RaceBatch], **params: Any) -> Tuple[Ratings, RaceChanges]:
+    """
+    Rate race batches (built against `store`, oldest first) and return final
+    ratings plus every athlete's per-race change. params go to backfill_packed
+    (Klocal, Kglobal, alpha, window, max_change, fast_math).
+    """
+    changes: RaceChanges = {}
+    for batch in batches:
+        history = RatingHistory()
+        backfill_packed(store, batch.packed, history=history, race_dates=batch.dates, **params)
+        rows = history.rows()
+        for race, athlete, delta in zip(rows["race"].tolist(), rows["athlete"].tolist(), rows["delta"].tolist()):
+            race_id = batch.race_ids[race]
+            if race_id:
+                changes.setdefault(store.athlete_id(athlete), {})[race_id] = delta
+
+    ratings = dict(zip(store.athlete_ids, store.ratings.tolist()))
+    return ratings, changes
+
+
+def rate_race_docs(race_docs: List[Dict[str, Any]]) -> Tuple[Ratings, RaceChanges]:
+    """compute_elo for in-memory race documents (any order; rated oldest first)."""
+    store = EloStore(base_elo=START_RATING)
+    ordered = sorted(race_docs, key=lambda race: (race["date"], race.get("raceId") or ""))
+    return compute_elo(store, [pack_race_docs(store, ordered)])
+
+
+def elo_score(rating: float) -> int:
+    return int(round(rating))
+
+
+def elo_change(delta: float) -> float:
+    return round(delta, ELO_CHANGE_DIGITS)
+
+
+def plan_updates(athlete_docs: Iterable[Dict[str, Any]], ratings: Ratings, changes: RaceChanges) -> List[Dict[str, Any]]:
+    """
+    One update spec per athlete whose eloScore or any recentRaces eloChange
+    differs from the computed value: {"athleteId", "set", "array_filters"}.
+    Athletes without a rated race are left alone.
+    """
+    updates: List[Dict[str, Any]] = []
+    for doc in athlete_docs:
+        athlete_id = doc.get("athleteId")
+        if athlete_id not in ratings:
+            continue
+        fields: Dict[str, Any] = {}
+        array_filters: List[Dict[str, Any]] = []
+
+        score = elo_score(ratings[athlete_id])
+        if doc.get("eloScore") != score:
+            fields["eloScore"] = score
+
+        race_changes = changes.get(athlete_id, {})
+        seen = set()
+        for race in doc.get("recentRaces") or []:
+            race_id = race.get("raceId")
+            if race_id not in race_changes or race_id in seen:
+                continue
+            seen.add(race_id)
+            change = elo_change(race_changes[race_id])
+            if race.get("eloChange") != change:
+                name = f"r{len(array_filters)}"
+                fields[f"recentRaces.$[{name}].eloChange"] = change
+                array_filters.append({f"{name}.raceId": race_id})
+
+        if fields:
+            updates.append({"athleteId": athlete_id, "set": fields, "array_filters": array_filters})
+    return updates
+
+
+def write_updates(athletes, updates: List[Dict[str, Any]], batch_size: int = 500) -> int:
+    """Send updates as unordered bulk_write batches; returns documents modified."""
+    modified = 0
+    for start in range(0, len(updates), batch_size):
+        ops = [
+            UpdateOne(
+                {"athleteId": u["athleteId"]},
+                {"$set": u["set"]},
+                array_filters=u["array_filters"] or None,
+            )
+            for u in updates[start:start + batch_size]
+        ]
+        result = athletes.bulk_write(ops, ordered=False)
+        modified += result.modified_count
+    return modified
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compute Elo from race results and write it onto athlete profiles.")
+    parser.add_argument(
+        "--mongo-uri",
+        default=os.getenv("MONGODB_URI"),
+        help="Mongo connection string (defaults to env MONGODB_URI).",
+    )
+    parser.add_argument(
+        "--db",
+        default=os.getenv("MONGODB_DATA_DB", "data"),
+        help="Mongo database name (defaults to env MONGODB_DATA_DB or 'data').",
+    )
+    parser.add_argument("--races-collection", default="races", help="Races collection name.")
+    parser.add_argument("--athletes-collection", default="athletes", help="Athletes collection name.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Races per cursor batch and updates per bulk_write.")
+    parser.add_argument(
+        "--tls-ca-file",
+        default=None,
+        help="Path to a CA bundle for TLS (defaults to certifi bundle when available).",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Compute and report changes without writing to Mongo.")
+
+    args = parser.parse_args()
+
+    if MongoClient is None:
+        print("Missing dependency: pymongo. Install with `python3 -m pip install pymongo`.", file=sys.stderr)
+        return 1
+    if not args.mongo_uri:
+        print("Missing Mongo URI. Pass --mongo-uri or set MONGODB_URI.", file=sys.stderr)
+        return 1
+
+    tls_ca_file = args.tls_ca_file or (certifi.where() if certifi else None)
+    client = MongoClient(args.mongo_uri, tlsCAFile=tls_ca_file)
+    db = client[args.db]
+
+    store = EloStore(base_elo=START_RATING)
+    batches = iter_race_batches(db[args.races_collection], store, batch_size=args.batch_size)
+    ratings, changes = compute_elo(store, batches)
+    print(f"Rated {len(ratings)} athletes across {sum(len(c) for c in changes.values())} race results")
+
+    athletes = db[args.athletes_collection]
+    projection = {"_id": 0, "athleteId": 1, "eloScore": 1, "recentRaces.raceId": 1, "recentRaces.eloChange": 1}
+    updates = plan_updates(athletes.find({}, projection), ratings, changes)
+    print(f"Athletes needing updates: {len(updates)}")
+
+    if updates and not args.dry_run:
+        modified = write_updates(athletes, updates, batch_size=args.batch_size)
+        print(f"Modified {modified} athlete documents")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""fast_math rating updates stay within fast_math_error_bound of exact mode."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import Elo  # noqa: E402
+
+KLOCAL, KGLOBAL, ALPHA = 4.5, 1.0, 0.2
+
+
+def wide_field(rng: np.random.Generator, n: int):
+    # Spread well past FAST_LUT_RANGE so the table's clamped ends are hit
+    ratings = 1500.0 + rng.uniform(-1.5, 1.5, n) * Elo.FAST_LUT_RANGE
+    return ratings, rng.permutation(n)
+
+
+def tied_field(rng: np.random.Generator, n: int):
+    # Few distinct ratings and shared finish positions
+    ratings = rng.choice([1400.0, 1500.0, 1500.0, 1650.0], size=n)
+    positions = np.sort(rng.integers(0, max(n // 2, 1), n))
+    return ratings, rng.permutation(positions)
+
+
+def max_error(ratings, positions, window, max_change=None):
+    exact, _ = Elo.apply_race_update(ratings, positions, KLOCAL, KGLOBAL, ALPHA, window=window, max_change=max_change)
+    fast, _ = Elo.apply_race_update(
+        ratings, positions, KLOCAL, KGLOBAL, ALPHA, window=window, max_change=max_change, fast_math=True
+    )
+    return float(np.max(np.abs(exact - fast)))
+
+
+@pytest.mark.parametrize("make_field", [wide_field, tied_field])
+@pytest.mark.parametrize("window", [1, 3, 8])
+@pytest.mark.parametrize("n", [2, 7, 60])
+def test_race_update_within_bound(make_field, window, n):
+    rng = np.random.default_rng(n * 100 + window)
+    bound = Elo.fast_math_error_bound(KLOCAL, ALPHA, window)
+    for _ in range(20):
+        ratings, positions = make_field(rng, n)
+        assert max_error(ratings, positions, window) <= bound
+        assert max_error(ratings, positions, window, max_change=20.0) <= bound
+
+
+def test_batched_and_segmented_within_bound():
+    rng = np.random.default_rng(0)
+    window = 3
+    bound = Elo.fast_math_error_bound(KLOCAL, ALPHA, window)
+
+    elos = np.stack([wide_field(rng, 12)[0] for _ in range(8)])
+    positions = np.stack([rng.permutation(12) for _ in range(8)])
+    exact, _ = Elo.apply_batched_update(elos, positions, KLOCAL, KGLOBAL, ALPHA, window=window)
+    fast, _ = Elo.apply_batched_update(elos, positions, KLOCAL, KGLOBAL, ALPHA, window=window, fast_math=True)
+    assert np.max(np.abs(exact - fast)) <= bound
+
+    sizes = np.array([1, 5, 12, 3])
+    seg_offsets = np.concatenate(([0], np.cumsum(sizes)))
+    elos = wide_field(rng, int(sizes.sum()))[0]
+    positions = np.concatenate([rng.permutation(s) for s in sizes])
+    exact, _ = Elo.apply_segmented_update(elos, positions, seg_offsets, KLOCAL, KGLOBAL, ALPHA, window=window)
+    fast, _ = Elo.apply_segmented_update(
+        elos, positions, seg_offsets, KLOCAL, KGLOBAL, ALPHA, window=window, fast_math=True
+    )
+    assert np.max(np.abs(exact - fast)) <= bound
@@ -0,0 +1,29 @@
+"""Memory of log-loss tuning in EloSim stays flat as the field grows."""
+
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import EloSim  # noqa: E402
+
+GRID = {"Klocal": [4.5, 5.0]}
+
+
+def halving_peak(n_athletes: int) -> int:
+    tracemalloc.start()
+    try:
+        EloSim.successive_halving(
+            GRID, objective="log_loss", min_races=1, max_races=2, eta=2,
+            n_seeds=10, n_athletes=n_athletes, skill_sd=20.0, processes=1,
+        )
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_log_loss_tuning_memory_is_flat_in_field_size():
+    small, large = halving_peak(400), halving_peak(1600)
+    # 16x the pairs; (seeds x pairs) temporaries peaked at ~440 MB at 1600
+    assert large < 1.5 * small
@@ -0,0 +1,52 @@
+"""Smoke tests: both CSV ingest entry points run end to end on a tiny data dir."""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import build_atlas_exports  # noqa: E402
+import ingest_races  # noqa: E402
+
+HEADER = "Name,Country,AgeGroup,Status,FinishTime,OverallRank,GenderRank,DivRank,Bib\n"
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    event = tmp_path / "data" / "laquinta"
+    event.mkdir(parents=True)
+    (event / "laquinta_2023.csv").write_text(
+        HEADER
+        + "Ana Ortiz,USA,F25-29,FIN,4:30:00,1,1,1,11\n"
+        + "Ben Cole,CAN,M30-34,FIN,4:45:10,2,1,1,12\n"
+        + "Cy Dunn,USA,M30-34,FIN,5:01:00,3,2,2,13\n"
+    )
+    (event / "laquinta_2024.csv").write_text(
+        HEADER
+        + "Cy Dunn,USA,M30-34,FIN,4:40:00,1,1,1,13\n"
+        + "Ana Ortiz,USA,F25-29,FIN,4:41:00,2,1,1,11\n"
+    )
+    return tmp_path / "data"
+
+
+def test_build_atlas_exports(data_dir, tmp_path, monkeypatch):
+    out_dir = tmp_path / "exports"
+    monkeypatch.setattr(sys, "argv", ["build_atlas_exports", "--data-dir", str(data_dir), "--out-dir", str(out_dir)])
+    build_atlas_exports.main()
+
+    races = (out_dir / "races.ndjson").read_text().splitlines()
+    athletes = [json.loads(line) for line in (out_dir / "athletes.ndjson").read_text().splitlines()]
+    assert len(races) == 2
+    assert len(athletes) == 3
+    # Rated from the races, not left at the placeholder score
+    assert all(doc["eloScore"] > 0 for doc in athletes)
+    assert any(race["eloChange"] != 0 for doc in athletes for race in doc["recentRaces"])
+
+
+def test_ingest_races_dry_run(data_dir, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["ingest_races", "--data-dir", str(data_dir), "--dry-run"])
+    ingest_races.main()
+    assert "Prepared 2 race documents and 3 athlete documents." in capsys.readouterr().out